@@ -6,11 +6,15 @@ from sqlalchemy import pool
 from alembic import context
 
 from data_app.database import Base
+from data_app.config import DATABASE_URL
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
+# the database comes from the app's settings (DATABASE_URL) rather than alembic.ini
+config.set_main_option("sqlalchemy.url", DATABASE_URL)
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -0,0 +1,39 @@
+"""chemical_lookup_cache for the chemical resolver
+
+Revision ID: 0a7d3e9c6b42
+Revises: f1c6a83e5d20
+Create Date: 2026-10-18 19:48:17.226904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a7d3e9c6b42'
+down_revision: Union[str, None] = 'f1c6a83e5d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if 'chemical_lookup_cache' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('chemical_lookup_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('queryType', sa.Enum('CAS', 'chemicalName'), nullable=True),
+        sa.Column('query', sa.String(), nullable=True),
+        sa.Column('found', sa.Boolean(), nullable=True),
+        sa.Column('data', sa.Text(), nullable=True),
+        sa.Column('fetchedAt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_chemical_lookup_cache_id', 'chemical_lookup_cache', ['id'], unique=False)
+        op.create_index('ix_chemical_lookup_cache_queryType_query', 'chemical_lookup_cache', ['queryType', 'query'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chemical_lookup_cache_queryType_query', table_name='chemical_lookup_cache')
+    op.drop_index('ix_chemical_lookup_cache_id', table_name='chemical_lookup_cache')
+    op.drop_table('chemical_lookup_cache')
@@ -0,0 +1,41 @@
+"""BPValue read again, leaving out boiling points at a reduced pressure
+
+Revision ID: 4dca6f592f3a
+Revises: a232745184de
+Create Date: 2026-10-18 17:05:48.612093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from data_app.functions.properties import parse_boiling_point
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4dca6f592f3a'
+down_revision: Union[str, None] = 'a232745184de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # "97 °C @ 3 mmHg" or "110-112 °C (15 mmHg)" were read as if at atmospheric pressure
+    connection = op.get_bind()
+    chemicals = sa.table('chemicals', sa.column('id'), sa.column('BP'), sa.column('BPValue'))
+    rows = [
+        {'chemical_id': id, 'BPValue': parse_boiling_point(BP)}
+        for id, BP, BPValue in connection.execute(sa.select(chemicals.c.id, chemicals.c.BP, chemicals.c.BPValue).where(chemicals.c.BP.is_not(None)))
+        if parse_boiling_point(BP) != BPValue
+    ]
+    if rows:
+        connection.execute(
+            sa.update(chemicals).where(chemicals.c.id == sa.bindparam('chemical_id')).values(BPValue=sa.bindparam('BPValue')),
+            rows,
+        )
+
+
+def downgrade() -> None:
+    # nothing to undo, the values that were dropped were wrong
+    pass
@@ -0,0 +1,65 @@
+"""chemical structure keys
+
+Revision ID: 5d2f8c1e9a47
+Revises: 42db6ac9714d
+Create Date: 2026-10-18 15:45:12.204315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from data_app.functions.structure import structure_key, structure_skeletons
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8c1e9a47'
+down_revision: Union[str, None] = '42db6ac9714d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'structureKey' not in [column['name'] for column in inspector.get_columns('chemicals')]:
+        op.add_column('chemicals', sa.Column('structureKey', sa.String(length=27), nullable=True))
+    if 'chemical_skeletons' not in inspector.get_table_names():
+        op.create_table('chemical_skeletons',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('skeleton', sa.String(length=14), nullable=True),
+        sa.Column('chemical_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['chemical_id'], ['chemicals.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_chemical_skeletons_id', 'chemical_skeletons', ['id'], unique=False)
+        op.create_index('ix_chemical_skeletons_skeleton', 'chemical_skeletons', ['skeleton', 'chemical_id'], unique=False)
+
+    # backfill, the first chemical with a given structure keeps the key
+    chemicals = sa.table('chemicals', sa.column('id'), sa.column('inchi'), sa.column('structureKey'))
+    skeletons = sa.table('chemical_skeletons', sa.column('chemical_id'), sa.column('skeleton'))
+    connection.execute(sa.delete(skeletons))
+    seen_keys = set()
+    for id, inchi in connection.execute(sa.select(chemicals.c.id, chemicals.c.inchi).order_by(chemicals.c.id)):
+        key = structure_key(inchi)
+        if key in seen_keys:
+            key = None
+        if key:
+            seen_keys.add(key)
+        connection.execute(sa.update(chemicals).where(chemicals.c.id == id).values(structureKey=key))
+        for skeleton in structure_skeletons(inchi):
+            connection.execute(sa.insert(skeletons).values(chemical_id=id, skeleton=skeleton))
+
+    if 'ix_chemicals_structureKey' not in [index['name'] for index in sa.inspect(connection).get_indexes('chemicals')]:
+        op.create_index('ix_chemicals_structureKey', 'chemicals', ['structureKey'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chemicals_structureKey', table_name='chemicals')
+    op.drop_index('ix_chemical_skeletons_skeleton', table_name='chemical_skeletons')
+    op.drop_index('ix_chemical_skeletons_id', table_name='chemical_skeletons')
+    op.drop_table('chemical_skeletons')
+    with op.batch_alter_table('chemicals') as batch_op:
+        batch_op.drop_column('structureKey')
@@ -0,0 +1,65 @@
+"""structure keys shared by chemicals with the same structure
+
+Revision ID: 67201113da6d
+Revises: de3a93513e94
+Create Date: 2026-10-18 16:31:40.906215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from data_app.functions.structure import structure_key
+
+
+# revision identifiers, used by Alembic.
+revision: str = '67201113da6d'
+down_revision: Union[str, None] = 'de3a93513e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _replace_index(unique: bool):
+    connection = op.get_bind()
+    indexes = {index['name']: index for index in sa.inspect(connection).get_indexes('chemicals')}
+    index = indexes.get('ix_chemicals_structureKey')
+    if index and bool(index['unique']) == unique:
+        return
+    if index:
+        op.drop_index('ix_chemicals_structureKey', table_name='chemicals')
+    op.create_index('ix_chemicals_structureKey', 'chemicals', ['structureKey'], unique=unique)
+
+
+def upgrade() -> None:
+    _replace_index(unique=False)
+
+    # chemicals that were stored without a key because another one had their structure
+    connection = op.get_bind()
+    chemicals = sa.table('chemicals', sa.column('id'), sa.column('inchi'), sa.column('structureKey'))
+    rows = connection.execute(
+        sa.select(chemicals.c.id, chemicals.c.inchi).where(
+            chemicals.c.structureKey.is_(None), chemicals.c.inchi.is_not(None)
+        )
+    ).all()
+    for id, inchi in rows:
+        key = structure_key(inchi)
+        if key:
+            connection.execute(sa.update(chemicals).where(chemicals.c.id == id).values(structureKey=key))
+
+
+def downgrade() -> None:
+    # a unique key again, only the first chemical with a given structure keeps it
+    connection = op.get_bind()
+    chemicals = sa.table('chemicals', sa.column('id'), sa.column('structureKey'))
+    first_ids = (
+        sa.select(sa.func.min(chemicals.c.id))
+        .where(chemicals.c.structureKey.is_not(None))
+        .group_by(chemicals.c.structureKey)
+    )
+    connection.execute(
+        sa.update(chemicals)
+        .where(chemicals.c.structureKey.is_not(None), chemicals.c.id.not_in(first_ids))
+        .values(structureKey=None)
+    )
+    _replace_index(unique=True)
@@ -0,0 +1,45 @@
+"""indexes for filter and join columns
+
+Revision ID: 9b41e07c3d58
+Revises: 5d2f8c1e9a47
+Create Date: 2026-10-18 16:02:37.518820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b41e07c3d58'
+down_revision: Union[str, None] = '5d2f8c1e9a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns), matching the query shapes in data_app/functions
+INDEXES = [
+    ('ix_orders_user_id_isConsumed', 'orders', ['user_id', 'isConsumed']),
+    ('ix_orders_status_orderDate', 'orders', ['status', 'orderDate']),
+    ('ix_orders_chemical_id', 'orders', ['chemical_id']),
+    ('ix_orders_supplier_id', 'orders', ['supplier_id']),
+    ('ix_orders_location_id', 'orders', ['location_id']),
+    ('ix_locations_user_id_locationName', 'locations', ['user_id', 'locationName']),
+    ('ix_suppliers_supplierName', 'suppliers', ['supplierName']),
+    ('ix_chemicals_chemicalName', 'chemicals', ['chemicalName']),
+    ('ix_chemicals_inchi', 'chemicals', ['inchi']),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # tables made by create_all already have them
+        if name not in [index['name'] for index in inspector.get_indexes(table)]:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,41 @@
+"""inventory_summary rebuilt without orders that have no user or chemical
+
+Revision ID: a232745184de
+Revises: 67201113da6d
+Create Date: 2026-10-18 17:02:15.340817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a232745184de'
+down_revision: Union[str, None] = '67201113da6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # rows keyed on a NULL chemical_id never conflicted, so they piled up: built again from the orders,
+    # as rebuild_inventory_summary() does
+    connection = op.get_bind()
+    orders = sa.table('orders', sa.column('id'), sa.column('user_id'), sa.column('location_id'), sa.column('chemical_id'), sa.column('status'), sa.column('isConsumed'), sa.column('amount'), sa.column('amountUnit'))
+    summary = sa.table('inventory_summary', sa.column('user_id'), sa.column('location_id'), sa.column('chemical_id'), sa.column('orders'), sa.column('grams'), sa.column('millilitres'))
+    grams = sa.case((orders.c.amountUnit == 'mg', orders.c.amount / 1000.0), (orders.c.amountUnit == 'g', orders.c.amount * 1.0), else_=0.0)
+    millilitres = sa.case((orders.c.amountUnit == 'mL', orders.c.amount * 1.0), (orders.c.amountUnit == 'L', orders.c.amount * 1000.0), else_=0.0)
+    location_id = sa.func.coalesce(orders.c.location_id, 0)
+    connection.execute(sa.delete(summary))
+    connection.execute(sa.insert(summary).from_select(
+        ['user_id', 'location_id', 'chemical_id', 'orders', 'grams', 'millilitres'],
+        sa.select(orders.c.user_id, location_id, orders.c.chemical_id, sa.func.count(orders.c.id), sa.func.sum(grams), sa.func.sum(millilitres))
+        .where(orders.c.status == 'received', orders.c.isConsumed == sa.false(), orders.c.user_id.is_not(None), orders.c.chemical_id.is_not(None))
+        .group_by(orders.c.user_id, location_id, orders.c.chemical_id)
+    ))
+
+
+def downgrade() -> None:
+    # nothing to undo, the rows that were dropped were wrong
+    pass
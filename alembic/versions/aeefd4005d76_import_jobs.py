@@ -0,0 +1,47 @@
+"""import_jobs for background CSV imports
+
+Revision ID: aeefd4005d76
+Revises: 0a7d3e9c6b42
+Create Date: 2026-10-18 16:24:53.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'aeefd4005d76'
+down_revision: Union[str, None] = '0a7d3e9c6b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    ## databases that were started by the app already have it, from create_all
+    if 'import_jobs' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('import_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.Enum('queued', 'running', 'completed', 'failed'), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('summary', sa.Text(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('rowsTotal', sa.Integer(), nullable=True),
+        sa.Column('rowsDone', sa.Integer(), nullable=True),
+        sa.Column('rowsFailed', sa.Integer(), nullable=True),
+        sa.Column('createdAt', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('startedAt', sa.DateTime(), nullable=True),
+        sa.Column('heartbeatAt', sa.DateTime(), nullable=True),
+        sa.Column('finishedAt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_import_jobs_id', 'import_jobs', ['id'], unique=False)
+        op.create_index('ix_import_jobs_status', 'import_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_import_jobs_status', table_name='import_jobs')
+    op.drop_index('ix_import_jobs_id', table_name='import_jobs')
+    op.drop_table('import_jobs')
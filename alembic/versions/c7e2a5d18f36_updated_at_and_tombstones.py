@@ -0,0 +1,64 @@
+"""updatedAt and tombstones for inventory sync
+
+Revision ID: c7e2a5d18f36
+Revises: 9b41e07c3d58
+Create Date: 2026-10-18 16:40:09.371552
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a5d18f36'
+down_revision: Union[str, None] = '9b41e07c3d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    # nullable, the default is set by the app (SQLite can't add a column with a non-constant default)
+    for table in ('orders', 'locations'):
+        if 'updatedAt' not in [column['name'] for column in inspector.get_columns(table)]:
+            op.add_column(table, sa.Column('updatedAt', sa.DateTime(), nullable=True))
+
+    # backfill, orders as of when they were made
+    now = datetime.utcnow()
+    orders = sa.table('orders', sa.column('orderDate'), sa.column('updatedAt'))
+    locations = sa.table('locations', sa.column('updatedAt'))
+    connection.execute(sa.update(orders).where(orders.c.updatedAt.is_(None)).values(updatedAt=sa.func.coalesce(orders.c.orderDate, now)))
+    connection.execute(sa.update(locations).where(locations.c.updatedAt.is_(None)).values(updatedAt=now))
+
+    for name, table in (('ix_orders_user_id_updatedAt', 'orders'), ('ix_locations_user_id_updatedAt', 'locations')):
+        if name not in [index['name'] for index in inspector.get_indexes(table)]:
+            op.create_index(name, table, ['user_id', 'updatedAt'], unique=False)
+
+    if 'tombstones' not in inspector.get_table_names():
+        op.create_table('tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.Enum('order', 'location'), nullable=True),
+        sa.Column('entity_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('deletedAt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_tombstones_id', 'tombstones', ['id'], unique=False)
+        op.create_index('ix_tombstones_user_id_deletedAt', 'tombstones', ['user_id', 'deletedAt'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tombstones_user_id_deletedAt', table_name='tombstones')
+    op.drop_index('ix_tombstones_id', table_name='tombstones')
+    op.drop_table('tombstones')
+    op.drop_index('ix_locations_user_id_updatedAt', table_name='locations')
+    op.drop_index('ix_orders_user_id_updatedAt', table_name='orders')
+    with op.batch_alter_table('locations') as batch_op:
+        batch_op.drop_column('updatedAt')
+    with op.batch_alter_table('orders') as batch_op:
+        batch_op.drop_column('updatedAt')
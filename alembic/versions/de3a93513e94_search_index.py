@@ -0,0 +1,38 @@
+"""full-text search index on chemicals and profiles
+
+Revision ID: de3a93513e94
+Revises: aeefd4005d76
+Create Date: 2026-10-18 16:27:02.514983
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from data_app.functions.search import SQLITE_SEARCH_TABLES, create_search_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de3a93513e94'
+down_revision: Union[str, None] = 'aeefd4005d76'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    ## FTS5 tables and their triggers on SQLite, GIN indexes on Postgres,
+    ## skipping whatever the app has already created at startup
+    create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        for table in SQLITE_SEARCH_TABLES:
+            for event in ('insert', 'delete', 'update'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_{event}')
+            op.execute(f'DROP TABLE IF EXISTS {table}')
+    if connection.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_profiles_search')
+        op.execute('DROP INDEX IF EXISTS ix_chemicals_search')
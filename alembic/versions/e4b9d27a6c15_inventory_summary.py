@@ -0,0 +1,57 @@
+"""inventory_summary, stock per user, location and chemical
+
+Revision ID: e4b9d27a6c15
+Revises: c7e2a5d18f36
+Create Date: 2026-10-18 18:12:44.508213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9d27a6c15'
+down_revision: Union[str, None] = 'c7e2a5d18f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    if 'inventory_summary' not in inspector.get_table_names():
+        op.create_table('inventory_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('location_id', sa.Integer(), nullable=True),
+        sa.Column('chemical_id', sa.Integer(), nullable=True),
+        sa.Column('orders', sa.Integer(), nullable=True),
+        sa.Column('grams', sa.Float(), nullable=True),
+        sa.Column('millilitres', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_inventory_summary_id', 'inventory_summary', ['id'], unique=False)
+        op.create_index('ix_inventory_summary_user_id_location_id_chemical_id', 'inventory_summary', ['user_id', 'location_id', 'chemical_id'], unique=True)
+
+    # built from the orders, as rebuild_inventory_summary() does (the table may already have been made by create_all)
+    orders = sa.table('orders', sa.column('id'), sa.column('user_id'), sa.column('location_id'), sa.column('chemical_id'), sa.column('status'), sa.column('isConsumed'), sa.column('amount'), sa.column('amountUnit'))
+    summary = sa.table('inventory_summary', sa.column('user_id'), sa.column('location_id'), sa.column('chemical_id'), sa.column('orders'), sa.column('grams'), sa.column('millilitres'))
+    grams = sa.case((orders.c.amountUnit == 'mg', orders.c.amount / 1000.0), (orders.c.amountUnit == 'g', orders.c.amount * 1.0), else_=0.0)
+    millilitres = sa.case((orders.c.amountUnit == 'mL', orders.c.amount * 1.0), (orders.c.amountUnit == 'L', orders.c.amount * 1000.0), else_=0.0)
+    location_id = sa.func.coalesce(orders.c.location_id, 0)
+    connection.execute(sa.delete(summary))
+    connection.execute(sa.insert(summary).from_select(
+        ['user_id', 'location_id', 'chemical_id', 'orders', 'grams', 'millilitres'],
+        sa.select(orders.c.user_id, location_id, orders.c.chemical_id, sa.func.count(orders.c.id), sa.func.sum(grams), sa.func.sum(millilitres))
+        .where(orders.c.status == 'received', orders.c.isConsumed == sa.false())
+        .group_by(orders.c.user_id, location_id, orders.c.chemical_id)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_summary_user_id_location_id_chemical_id', table_name='inventory_summary')
+    op.drop_index('ix_inventory_summary_id', table_name='inventory_summary')
+    op.drop_table('inventory_summary')
@@ -0,0 +1,57 @@
+"""numeric MW, MP, BP and density columns
+
+Revision ID: f1c6a83e5d20
+Revises: e4b9d27a6c15
+Create Date: 2026-10-18 19:05:31.842617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from data_app.functions.properties import property_values
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6a83e5d20'
+down_revision: Union[str, None] = 'e4b9d27a6c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ('MWValue', 'MPValue', 'BPValue', 'densityValue')
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    inspector = sa.inspect(connection)
+
+    existing = [column['name'] for column in inspector.get_columns('chemicals')]
+    for column in COLUMNS:
+        if column not in existing:
+            op.add_column('chemicals', sa.Column(column, sa.Float(), nullable=True))
+
+    # backfill, parsed from the text columns
+    chemicals = sa.table('chemicals', sa.column('id'), sa.column('MW'), sa.column('MP'), sa.column('BP'), sa.column('density'), *[sa.column(column) for column in COLUMNS])
+    rows = [
+        {'chemical_id': id, **property_values(MW, MP, BP, density)}
+        for id, MW, MP, BP, density in connection.execute(sa.select(chemicals.c.id, chemicals.c.MW, chemicals.c.MP, chemicals.c.BP, chemicals.c.density))
+    ]
+    if rows:
+        connection.execute(
+            sa.update(chemicals).where(chemicals.c.id == sa.bindparam('chemical_id')).values({column: sa.bindparam(column) for column in COLUMNS}),
+            rows,
+        )
+
+    indexes = [index['name'] for index in sa.inspect(connection).get_indexes('chemicals')]
+    for column in COLUMNS:
+        if f'ix_chemicals_{column}' not in indexes:
+            op.create_index(f'ix_chemicals_{column}', 'chemicals', [column], unique=False)
+
+
+def downgrade() -> None:
+    for column in COLUMNS:
+        op.drop_index(f'ix_chemicals_{column}', table_name='chemicals')
+    with op.batch_alter_table('chemicals') as batch_op:
+        for column in COLUMNS:
+            batch_op.drop_column(column)
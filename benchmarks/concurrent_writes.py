@@ -0,0 +1,96 @@
+## Concurrent orders (place_order, as /order/ does) against a SQLite file, each committed on
+## its own session and through the write queue. The queue batches commits, so it pays off
+## when a commit is expensive: run it with SQLITE_SYNCHRONOUS=FULL as well as the default.
+##
+## run from the repository root:
+##   python -m benchmarks.concurrent_writes [number of threads] [orders per thread]
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+## the write queue uses the app's engine, so the database has to be chosen before it's imported
+directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.db"
+
+from sqlalchemy import func, insert, select
+
+from data_app import config, models
+from data_app.database import Base, SessionLocal, engine
+from data_app.functions import writequeue
+from data_app.functions.placeorder import place_order
+from data_app.schemas import ChemicalIn, OrderIn
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.User), [{"id": 1, "username": "u", "full_name": "U"}])
+        db.execute(
+            insert(models.Chemical), [{"CAS": "64-17-5", "chemicalName": "Ethanol"}]
+        )
+        db.execute(insert(models.Supplier), [{"supplierName": "Supplier"}])
+        db.commit()
+
+
+def write_orders(n_orders: int, failures: list):
+    chemical = ChemicalIn(CAS="64-17-5", chemicalName="Ethanol")
+    order = OrderIn(supplier_id=1, amount=1, amountUnit="g")
+    for _ in range(n_orders):
+        db = SessionLocal()
+        try:
+            writequeue.run_write(
+                db, lambda session: place_order(session, 1, chemical, order).id
+            )
+        except Exception as error:
+            failures.append(error)
+        finally:
+            db.close()
+
+
+def timed(n_threads: int, n_orders: int):
+    failures = []
+    threads = [
+        threading.Thread(target=write_orders, args=(n_orders, failures))
+        for _ in range(n_threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(failures)
+
+
+def main():
+    n_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n_orders = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    seed()
+
+    writequeue.WRITE_QUEUE_ENABLED = False
+    direct_time, direct_failures = timed(n_threads, n_orders)
+    writequeue.WRITE_QUEUE_ENABLED = True
+    queued_time, queued_failures = timed(n_threads, n_orders)
+
+    with SessionLocal() as db:
+        written = db.scalar(select(func.count(models.Order.id)))
+
+    total = n_threads * n_orders
+    print(
+        f"{n_threads} threads x {n_orders} orders, {written} of {total * 2} written,"
+        f" synchronous={config.SQLITE_SYNCHRONOUS}"
+    )
+    print(
+        f"  commit per request: {total / direct_time:8.0f} orders/s"
+        f"  ({direct_failures} failed)"
+    )
+    print(
+        f"  write queue:        {total / queued_time:8.0f} orders/s"
+        f"  ({queued_failures} failed)"
+    )
+
+
+if __name__ == "__main__":
+    main()
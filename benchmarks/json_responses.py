@@ -0,0 +1,72 @@
+## Compares /orderslist/ and /inventory/ through the usual response_model flow with the
+## FAST_JSON path (orjson for the trusted order dicts, a single TypeAdapter pass otherwise),
+## timing the whole request and checking that both give the same JSON.
+##
+## run from the repository root:
+##   python -m benchmarks.json_responses [number of orders]
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+## the app uses its own engine, so the database has to be chosen before it's imported
+directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.db"
+
+from fastapi.testclient import TestClient
+
+from data_app import config, models
+from data_app.database import SessionLocal
+from data_app.functions.auth import validate_current_admin, validate_current_user
+from data_app.main import app
+
+from .orders_listing import seed
+
+ROUNDS = 5
+
+ENDPOINTS = {
+    "/orderslist/ (1000 orders)": "/orderslist/?limit=1000",
+    "/inventory/ (all orders of a user)": "/inventory/",
+}
+
+
+def timed(client: TestClient, url: str):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert response.status_code == 200, response.text
+    return best, response.content
+
+
+def main():
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with SessionLocal() as db:
+        seed(db, n_orders)
+
+    ## user 1, with a twentieth of the orders
+    app.dependency_overrides[validate_current_admin] = lambda: models.User(id=1)
+    app.dependency_overrides[validate_current_user] = lambda: models.User(id=1)
+    client = TestClient(app)
+
+    print(f"{n_orders} orders, best of {ROUNDS}")
+    for name, url in ENDPOINTS.items():
+        config.FAST_JSON = False
+        model_time, model_body = timed(client, url)
+        config.FAST_JSON = True
+        fast_time, fast_body = timed(client, url)
+        assert json.loads(model_body) == json.loads(fast_body)
+
+        print(f"  {name}, {len(model_body) / 1e6:.1f} MB")
+        print(f"    response_model: {model_time * 1000:8.1f} ms")
+        print(f"    FAST_JSON:      {fast_time * 1000:8.1f} ms")
+        print(f"    speedup:        {model_time / fast_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+## Placing orders the way /order/ used to (SELECT by CAS, then the chemical and the order
+## each added, committed and refreshed, written out below) and with place_order
+## (one transaction, one commit), half of them for chemicals that are new to the database.
+## Statements are counted too.
+##
+## run from the repository root:
+##   python -m benchmarks.order_placement [number of orders]
+
+import os
+import sys
+import tempfile
+import time
+
+## the app uses its own engine, so the database has to be chosen before it's imported
+directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{directory}/benchmark.db"
+
+from sqlalchemy import event, insert
+
+from data_app import models
+from data_app.database import Base, SessionLocal, engine
+from data_app.functions.inventorysummary import (
+    StockChanges,
+    apply_stock_changes,
+    count_stock,
+    stock_fields,
+)
+from data_app.functions.placeorder import place_order
+from data_app.functions.properties import property_values
+from data_app.functions.responsecache import invalidate_responses
+from data_app.functions.structure import structure_key, structure_skeletons
+from data_app.schemas import ChemicalIn, OrderIn
+
+statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(insert(models.User), [{"id": 1, "username": "u", "full_name": "U"}])
+        db.execute(insert(models.Supplier), [{"supplierName": "Supplier"}])
+        db.commit()
+
+
+def previous_order(db, chemical: ChemicalIn, order: OrderIn):
+    db_chemical = (
+        db.query(models.Chemical).filter(models.Chemical.CAS == chemical.CAS).first()
+    )
+    if not db_chemical:
+        db_chemical = models.Chemical(
+            CAS=chemical.CAS,
+            chemicalName=chemical.chemicalName,
+            MW=chemical.MW,
+            MP=chemical.MP,
+            BP=chemical.BP,
+            density=chemical.density,
+            **property_values(chemical.MW, chemical.MP, chemical.BP, chemical.density),
+            smile=chemical.smile,
+            inchi=chemical.inchi,
+            structureKey=structure_key(chemical.inchi),
+            skeletons=[
+                models.ChemicalSkeleton(skeleton=skeleton)
+                for skeleton in structure_skeletons(chemical.inchi)
+            ],
+        )
+        db.add(db_chemical)
+        invalidate_responses(db, "chemicals")
+        db.commit()
+        db.refresh(db_chemical)
+
+    db_order = models.Order(
+        user_id=1,
+        chemical_id=db_chemical.id,
+        supplier_id=order.supplier_id,
+        amount=order.amount,
+        amountUnit=order.amountUnit,
+        supplierPN=order.supplierPN,
+    )
+    db.add(db_order)
+    db.flush()
+    changes = StockChanges()
+    count_stock(changes, stock_fields(db_order))
+    apply_stock_changes(db, changes)
+    db.commit()
+    db.refresh(db_order)
+
+
+def timed(place, prefix: str, n_orders: int):
+    global statements
+    statements = 0
+    start = time.perf_counter()
+    for i in range(n_orders):
+        ## every other order is for a chemical that was just added
+        chemical = ChemicalIn(CAS=f"{prefix}-{i // 2}", chemicalName=f"Chemical {i}")
+        order = OrderIn(supplier_id=1, amount=1, amountUnit="g")
+        with SessionLocal() as db:
+            place(db, chemical, order)
+    return time.perf_counter() - start, statements / n_orders
+
+
+def main():
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed()
+
+    previous_time, previous_statements = timed(previous_order, "1", n_orders)
+    single_time, single_statements = timed(
+        lambda db, chemical, order: place_order(db, 1, chemical, order), "2", n_orders
+    )
+
+    print(f"{n_orders} orders, half of them for new chemicals")
+    print(
+        f"  two commits:  {previous_time / n_orders * 1000:6.2f} ms/order"
+        f"  {previous_statements:5.1f} statements/order"
+    )
+    print(
+        f"  place_order:  {single_time / n_orders * 1000:6.2f} ms/order"
+        f"  {single_statements:5.1f} statements/order"
+    )
+
+
+if __name__ == "__main__":
+    main()
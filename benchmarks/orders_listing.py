@@ -0,0 +1,126 @@
+## Compares the ORM read path for order listings (selectinload + Order validation
+## from attributes) with the joined column projection used by /inventory/ and /orderslist/.
+##
+## run from the repository root:
+##   python -m benchmarks.orders_listing [number of orders]
+
+import json
+import sys
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+from data_app import models
+from data_app.database import Base
+from data_app.functions.order import _orders_projection, _order_from_row
+from data_app.schemas import Order
+
+ROUNDS = 5
+
+orders_adapter = TypeAdapter(list[Order])
+
+
+def seed(db: Session, n_orders: int):
+    n_users, n_chemicals, n_suppliers = 20, 500, 10
+    db.execute(
+        insert(models.User),
+        [
+            {"id": i, "username": f"user{i}", "full_name": f"User {i}"}
+            for i in range(1, n_users + 1)
+        ],
+    )
+    db.execute(
+        insert(models.Chemical),
+        [
+            {
+                "CAS": f"{i}-00-0",
+                "chemicalName": f"Chemical {i}",
+                "MW": "100.00",
+                "MP": "25 °C",
+                "smile": "CCO",
+                "inchi": "InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3",
+            }
+            for i in range(1, n_chemicals + 1)
+        ],
+    )
+    db.execute(
+        insert(models.Supplier),
+        [{"supplierName": f"Supplier {i}"} for i in range(1, n_suppliers + 1)],
+    )
+    db.execute(
+        insert(models.Order),
+        [
+            {
+                "user_id": i % n_users + 1,
+                "chemical_id": i % n_chemicals + 1,
+                "supplier_id": i % n_suppliers + 1,
+                "status": "received",
+                "amount": 5,
+                "amountUnit": "g",
+                "supplierPN": f"PN{i}",
+            }
+            for i in range(n_orders)
+        ],
+    )
+    db.commit()
+
+
+def orm_path(db: Session):
+    ordersList = (
+        db.query(models.Order)
+        .options(
+            selectinload(models.Order.user),
+            selectinload(models.Order.chemical),
+            selectinload(models.Order.supplier),
+            selectinload(models.Order.location),
+        )
+        .all()
+    )
+    validated = orders_adapter.validate_python(ordersList, from_attributes=True)
+    return json.dumps(orders_adapter.dump_python(validated, mode="json"))
+
+
+def projection_path(db: Session):
+    ordersList = [_order_from_row(row) for row in _orders_projection(db).all()]
+    validated = orders_adapter.validate_python(ordersList)
+    return json.dumps(orders_adapter.dump_python(validated, mode="json"))
+
+
+def timed(path, engine):
+    best = None
+    for _ in range(ROUNDS):
+        with Session(engine) as db:
+            start = time.perf_counter()
+            body = path(db)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    n_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        seed(db, n_orders)
+
+    orm_time, orm_body = timed(orm_path, engine)
+    projection_time, projection_body = timed(projection_path, engine)
+    assert json.loads(orm_body) == json.loads(projection_body)
+
+    print(f"{n_orders} orders, best of {ROUNDS}")
+    print(f"  ORM + selectinload: {orm_time * 1000:8.1f} ms")
+    print(f"  column projection:  {projection_time * 1000:8.1f} ms")
+    print(f"  speedup:            {orm_time / projection_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
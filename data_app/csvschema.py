@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional, Union
+from datetime import datetime
 from enum import Enum as PyEnum
 
 
@@ -54,3 +55,72 @@ class CSVGlobal(BaseModel):
     chemicalList: list[CSVChemical]
     supplierList: list[CSVSupplier]
     orderList: list[CSVOrder]
+
+
+class CSVImportCount(BaseModel):
+    inserted: int = 0
+    skipped: int = 0
+
+
+class CSVImportSummary(BaseModel):
+    users: CSVImportCount
+    chemicals: CSVImportCount
+    suppliers: CSVImportCount
+    orders: CSVImportCount
+
+
+## column layout of an uploaded CSV file, one order per row
+CSV_COLUMNS = [
+    "user_id",
+    "username",
+    "full_name",
+    "CAS",
+    "chemicalName",
+    "MW",
+    "MP",
+    "BP",
+    "density",
+    "smile",
+    "inchi",
+    "supplierName",
+    "status",
+    "amount",
+    "amountUnit",
+    "supplierPN",
+]
+
+
+class CSVRowError(BaseModel):
+    row: int
+    detail: str
+
+
+class CSVUploadReport(BaseModel):
+    rowsRead: int = 0
+    rowsFailed: int = 0
+    batches: int = 0
+    summary: CSVImportSummary
+    errors: list[CSVRowError] = []
+    ## set if the database failed, the counts are of what was committed before that
+    aborted: Optional[str] = None
+
+
+class ImportJobStatusEnum(str, PyEnum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+class ImportJob(BaseModel):
+    id: int
+    status: ImportJobStatusEnum
+    rowsTotal: int
+    rowsDone: int
+    rowsFailed: int
+    rowsPerSecond: Optional[float] = None
+    summary: Optional[CSVImportSummary] = None
+    error: Optional[str] = None
+    createdAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
@@ -0,0 +1,88 @@
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+## Totals for dashboards, added up by the database with GROUP BY rather than by the client.
+## Amounts are normalized to grams (mg, g) and millilitres (mL, L) before being summed.
+
+GRAMS = case(
+    (models.Order.amountUnit == "mg", models.Order.amount / 1000.0),
+    (models.Order.amountUnit == "g", models.Order.amount * 1.0),
+    else_=0.0,
+)
+MILLILITRES = case(
+    (models.Order.amountUnit == "mL", models.Order.amount * 1.0),
+    (models.Order.amountUnit == "L", models.Order.amount * 1000.0),
+    else_=0.0,
+)
+
+## stock on hand: received and not used up yet
+IN_STOCK = (models.Order.status == "received", models.Order.isConsumed == False)
+
+
+def _month(dialect: str):
+    ## "YYYY-MM" of the order date
+    if dialect == "postgresql":
+        return func.to_char(models.Order.orderDate, "YYYY-MM")
+    return func.strftime("%Y-%m", models.Order.orderDate)
+
+
+def get_stock_by_chemical(db: Session):
+    ## from the inventory summary, which already has the stock of each user and location
+    rows = db.execute(
+        select(
+            models.Chemical.id.label("chemical_id"),
+            models.Chemical.CAS,
+            models.Chemical.chemicalName,
+            func.sum(models.InventorySummary.orders).label("orders"),
+            func.sum(models.InventorySummary.grams).label("grams"),
+            func.sum(models.InventorySummary.millilitres).label("millilitres"),
+        )
+        .join(
+            models.Chemical, models.InventorySummary.chemical_id == models.Chemical.id
+        )
+        .group_by(models.Chemical.id, models.Chemical.CAS, models.Chemical.chemicalName)
+        .order_by(models.Chemical.id)
+    )
+    stockList = [row._asdict() for row in rows]
+    return stockList
+
+
+def get_supplier_months(db: Session):
+    ## orders placed per supplier per month, whatever their status now
+    month = _month(db.get_bind().dialect.name).label("month")
+    rows = db.execute(
+        select(
+            models.Supplier.id.label("supplier_id"),
+            models.Supplier.supplierName,
+            month,
+            func.count(models.Order.id).label("orders"),
+            func.sum(GRAMS).label("grams"),
+            func.sum(MILLILITRES).label("millilitres"),
+        )
+        .join(models.Supplier, models.Order.supplier_id == models.Supplier.id)
+        .group_by(models.Supplier.id, models.Supplier.supplierName, month)
+        .order_by(models.Supplier.id, month)
+    )
+    supplierMonths = [row._asdict() for row in rows]
+    return supplierMonths
+
+
+def get_status_counts(db: Session):
+    rows = db.execute(
+        select(models.Order.status, func.count(models.Order.id).label("orders"))
+        .group_by(models.Order.status)
+        .order_by(models.Order.status)
+    )
+    statusCounts = [row._asdict() for row in rows]
+    return statusCounts
+
+
+def get_analytics(db: Session):
+    data = {
+        "stockByChemical": get_stock_by_chemical(db),
+        "supplierMonths": get_supplier_months(db),
+        "statusCounts": get_status_counts(db),
+    }
+    return data
@@ -5,11 +5,16 @@ from fastapi.security import (
     HTTPAuthorizationCredentials,
 )
 
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from jose import JWTError, jwt
 
+from collections import OrderedDict
 import json
+import threading
+import time
 
 from dotenv import load_dotenv
 import os
@@ -17,17 +22,7 @@ import os
 from .. import models
 from ..schemas import TokenData
 
-from ..database import SessionLocal
-
-
-# Dependencies
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+from ..database import get_db, get_async_db
 
 http_bearer = HTTPBearer()
 
@@ -37,17 +32,72 @@ load_dotenv()
 SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = os.environ.get("ALGORITHM")
 
+## Verified tokens are cached with the identity they carry, so repeat requests skip
+## the signature check and the user lookup. Entries last TOKEN_CACHE_TTL seconds
+## (or until the token expires) and are dropped when the user is patched or deleted.
+## Each worker has its own cache, so other workers can lag behind a change by up to the TTL.
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", 60))
+
+# token -> (expires at (monotonic), role, user), least recently used first
+token_cache = OrderedDict()
+token_cache_lock = threading.Lock()
+
+
+def get_cached_identity(token: str):
+    with token_cache_lock:
+        entry = token_cache.get(token)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del token_cache[token]
+            return None
+        token_cache.move_to_end(token)
+        return entry[1], entry[2]
+
+
+def cache_identity(token: str, expires: float | None, role: str, user: models.User):
+    ttl = TOKEN_CACHE_TTL
+    if expires is not None:
+        ttl = min(ttl, expires - time.time())
+    if ttl <= 0:
+        return
+
+    ## a detached copy, which identify() merges into each request's session
+    cached_user = models.User(
+        id=user.id, username=user.username, full_name=user.full_name
+    )
+    make_transient_to_detached(cached_user)
+    with token_cache_lock:
+        token_cache[token] = (time.monotonic() + ttl, role, cached_user)
+        token_cache.move_to_end(token)
+        while len(token_cache) > TOKEN_CACHE_SIZE:
+            token_cache.popitem(last=False)
 
-async def validate_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
-    db: Session = Depends(get_db),
-):
-    credentials_exception = HTTPException(
+
+def invalidate_cached_user(user_id: int):
+    with token_cache_lock:
+        for token in [
+            token for token, entry in token_cache.items() if entry[2].id == user_id
+        ]:
+            del token_cache[token]
+
+
+@event.listens_for(models.User, "after_delete")
+def invalidate_deleted_user(mapper, connection, target):
+    invalidate_cached_user(target.id)
+
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    token = credentials.credentials
+
+
+def decode_token(token: str):
+    ## returns (payload, role, user id) for a token with a valid signature
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_role = payload.get("sub")
@@ -55,40 +105,70 @@ async def validate_current_user(
         id = user_id_role_dict["id"]
         role = user_id_role_dict["role"]
         if id is None:
-            raise credentials_exception
+            raise credentials_exception()
         token_data = TokenData(id=id)
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
+        raise credentials_exception()
+    return payload, role, token_data.id
+
+
+def identify(token: str, db: Session):
+    ## returns (role, user) for a valid token, with the user in db's session:
+    ## a cached user is merged into it without a query, so its relationships load as usual
+    cached = get_cached_identity(token)
+    if cached:
+        role, user = cached
+        return role, db.merge(user, load=False)
+
+    payload, role, id = decode_token(token)
+    user = db.query(models.User).filter(models.User.id == id).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
+
+    cache_identity(token, payload.get("exp"), role, user)
+    return role, user
+
+
+## the same for async def endpoints, on their AsyncSession
+async def identify_async(token: str, db: AsyncSession):
+    cached = get_cached_identity(token)
+    if cached:
+        role, user = cached
+        return role, await db.merge(user, load=False)
+
+    payload, role, id = decode_token(token)
+    user = await db.scalar(select(models.User).where(models.User.id == id))
+    if user is None:
+        raise credentials_exception()
+
+    cache_identity(token, payload.get("exp"), role, user)
+    return role, user
+
+
+## plain def, so FastAPI runs them in its threadpool and a token lookup never blocks the event loop
+def validate_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    db: Session = Depends(get_db),
+):
+    role, user = identify(credentials.credentials, db)
     return user
 
 
-async def validate_current_admin(
+def validate_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
     db: Session = Depends(get_db),
 ):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid authentication credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id_role = payload.get("sub")
-        user_id_role_dict = json.loads(user_id_role)
-        id = user_id_role_dict["id"]
-        role = user_id_role_dict["role"]
-        if id is None:
-            raise credentials_exception
-        if role != "admin":
-            raise credentials_exception
-        token_data = TokenData(id=id)
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.id == token_data.id).first()
-    if user is None:
-        raise credentials_exception
+    role, user = identify(credentials.credentials, db)
+    if role != "admin":
+        raise credentials_exception()
+    return user
+
+
+## For async def endpoints: it depends on get_async_db like the endpoint does, so FastAPI
+## gives both the same AsyncSession, and the request uses one session as with get_db.
+async def validate_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    db: AsyncSession = Depends(get_async_db),
+):
+    role, user = await identify_async(credentials.credentials, db)
     return user
@@ -0,0 +1,214 @@
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import lock_for_write
+from ..schemas import ChemOrderIn, InventoryPatchIn
+from .inventorysummary import (
+    STOCK_FIELDS,
+    StockChanges,
+    apply_stock_changes,
+    count_stock,
+    stock_fields,
+)
+from .placeorder import upsert_chemical
+from .responsecache import invalidate_responses
+
+## Batch versions of the order and inventory writes. Each one checks every id (and who it
+## belongs to) with one SELECT, applies all the allowed items with one UPDATE (or INSERT),
+## and commits once. Items that can't be applied are reported rather than failing the batch.
+
+
+def _orders_stock(db: Session, order_ids: list[int]):
+    ## order id -> its STOCK_FIELDS, for the orders that exist,
+    ## locked until the batch is committed
+    lock_for_write(db)
+    rows = db.execute(
+        select(
+            models.Order.id, *[getattr(models.Order, field) for field in STOCK_FIELDS]
+        )
+        .where(models.Order.id.in_(set(order_ids)))
+        .with_for_update()
+    )
+    return {row.id: row._asdict() for row in rows}
+
+
+def _order_owners(orders: dict):
+    ## order id -> user id
+    return {id: order["user_id"] for id, order in orders.items()}
+
+
+def _apply_order_changes(db: Session, orders: dict, new_values: dict):
+    ## the inventory summary change of setting new_values on each of orders
+    changes = StockChanges()
+    for id, values in new_values.items():
+        count_stock(changes, orders[id], -1)
+        count_stock(changes, {**orders[id], **values})
+    apply_stock_changes(db, changes)
+
+
+def _item_result(id: int, owners: dict, user_id: int | None, status: str):
+    if id not in owners:
+        return {"id": id, "status": "not_found", "detail": "Order not found"}
+    if user_id is not None and owners[id] != user_id:
+        return {"id": id, "status": "forbidden", "detail": "Not your order"}
+    return {"id": id, "status": status}
+
+
+## admin: any order
+def patch_orders_status(db: Session, order_ids: list[int], status: str):
+    orders = _orders_stock(db, order_ids)
+    owners = _order_owners(orders)
+
+    if owners:
+        db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(owners.keys()))
+            .values(status=status)
+        )
+        _apply_order_changes(db, orders, {id: {"status": status} for id in owners})
+    db.commit()
+
+    results = [_item_result(id, owners, None, "updated") for id in order_ids]
+    return results
+
+
+## user: only their own orders are marked received
+def patch_inventory_statuses(db: Session, user_id: int, order_ids: list[int]):
+    orders = _orders_stock(db, order_ids)
+    owners = _order_owners(orders)
+    owned = [id for id, owner in owners.items() if owner == user_id]
+
+    if owned:
+        db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(owned))
+            .values(status="received")
+        )
+        _apply_order_changes(db, orders, {id: {"status": "received"} for id in owned})
+    db.commit()
+
+    results = [_item_result(id, owners, user_id, "updated") for id in order_ids]
+    return results
+
+
+## user: only their own orders, moved only to their own locations
+def patch_inventory_amounts_locations(
+    db: Session, user_id: int, patches: list[InventoryPatchIn]
+):
+    orders = _orders_stock(db, [patch.id for patch in patches])
+    owners = _order_owners(orders)
+
+    location_ids = {patch.location_id for patch in patches if patch.location_id}
+    own_locations = set()
+    if location_ids:
+        own_locations = set(
+            db.scalars(
+                select(models.Location.id).where(
+                    models.Location.id.in_(location_ids),
+                    models.Location.user_id == user_id,
+                )
+            ).all()
+        )
+
+    results = []
+    rows = []
+    updatedAt = datetime.utcnow()
+    for patch in patches:
+        result = _item_result(patch.id, owners, user_id, "updated")
+        if (
+            result["status"] == "updated"
+            and patch.location_id
+            and patch.location_id not in own_locations
+        ):
+            result = {
+                "id": patch.id,
+                "status": "forbidden",
+                "detail": "Not your location",
+            }
+
+        if result["status"] == "updated":
+            rows.append(
+                {
+                    "id": patch.id,
+                    "amount": patch.amount,
+                    "isConsumed": patch.isConsumed,
+                    "location_id": patch.location_id,
+                    "updatedAt": updatedAt,
+                }
+            )
+        results.append(result)
+
+    ## a list of parameter sets makes this an UPDATE by primary key, sent with executemany
+    if rows:
+        db.execute(update(models.Order), rows)
+        ## a later patch of the same order wins, as it does in the UPDATE
+        _apply_order_changes(
+            db,
+            orders,
+            {
+                row["id"]: {
+                    "amount": row["amount"],
+                    "isConsumed": row["isConsumed"],
+                    "location_id": row["location_id"],
+                }
+                for row in rows
+            },
+        )
+    db.commit()
+
+    return results
+
+
+def add_new_orders(db: Session, user_id: int, chemOrders: list[ChemOrderIn]):
+    ## like /order/ for each item: chemicals are looked up by CAS (all at once),
+    ## and the ones that aren't in the database yet are added with upsert_chemical,
+    ## so a request adding the same chemical at the same time can't make this one fail
+    chemical_ids = dict(
+        db.execute(
+            select(models.Chemical.CAS, models.Chemical.id).where(
+                models.Chemical.CAS.in_(
+                    {chemOrder.chemicalData.CAS for chemOrder in chemOrders}
+                )
+            )
+        ).all()
+    )
+
+    new_chemicals = False
+    for chemOrder in chemOrders:
+        chemicalData = chemOrder.chemicalData
+        if chemicalData.CAS in chemical_ids:
+            continue
+        chemical_id, created = upsert_chemical(db, chemicalData)
+        chemical_ids[chemicalData.CAS] = chemical_id
+        new_chemicals = new_chemicals or created
+
+    db_orders = [
+        models.Order(
+            user_id=user_id,
+            chemical_id=chemical_ids[chemOrder.chemicalData.CAS],
+            supplier_id=chemOrder.orderData.supplier_id,
+            amount=chemOrder.orderData.amount,
+            amountUnit=chemOrder.orderData.amountUnit,
+            supplierPN=chemOrder.orderData.supplierPN,
+        )
+        for chemOrder in chemOrders
+    ]
+    db.add_all(db_orders)
+    db.flush()
+
+    ## new orders are "submitted", so not in stock yet
+    changes = StockChanges()
+    for db_order in db_orders:
+        count_stock(changes, stock_fields(db_order))
+    apply_stock_changes(db, changes)
+
+    results = [{"id": db_order.id, "status": "created"} for db_order in db_orders]
+
+    if new_chemicals:
+        invalidate_responses(db, "chemicals")
+    db.commit()
+
+    return results
@@ -1,26 +1,13 @@
 from fastapi import HTTPException, status
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, tuple_
 from sqlalchemy.orm import Session, selectinload
 
 from .. import models
-from ..schemas import ChemicalIn, Chemical
-
-
-def add_new_chemical(db: Session, chemical: ChemicalIn):
-    db_chemical = models.Chemical(
-        CAS=chemical.CAS,
-        chemicalName=chemical.chemicalName,
-        MW=chemical.MW,
-        MP=chemical.MP,
-        BP=chemical.BP,
-        density=chemical.density,
-        smile=chemical.smile,
-        inchi=chemical.inchi,
-    )
-    db.add(db_chemical)
-    db.commit()
-    db.refresh(db_chemical)
-    return db_chemical
+from ..schemas import Chemical, ChemicalFilters
+from .order import touch_orders
+from .pagination import decode_cursor, encode_cursor
+from .properties import property_values
+from .responsecache import invalidate_responses
 
 
 def patch_chemical_details(db: Session, chemical: Chemical):
@@ -37,6 +24,12 @@ def patch_chemical_details(db: Session, chemical: Chemical):
     patch_chemical.MP = chemical.MP
     patch_chemical.BP = chemical.BP
     patch_chemical.density = chemical.density
+    for column, value in property_values(
+        chemical.MW, chemical.MP, chemical.BP, chemical.density
+    ).items():
+        setattr(patch_chemical, column, value)
+    touch_orders(db, models.Order.chemical_id == chemical.id)
+    invalidate_responses(db, "chemicals")
     db.commit()
 
 
@@ -46,5 +39,73 @@ def remove_chemical(db: Session, id: int):
     if not rm_chemical:
         raise HTTPException(status_code=404, detail="Chemical not found")
 
+    ## its orders are deleted with it, and so is all of its stock
+    db.execute(
+        delete(models.InventorySummary).where(models.InventorySummary.chemical_id == id)
+    )
     db.delete(rm_chemical)
+    invalidate_responses(db, "chemicals")
     db.commit()
+
+
+## the numeric column behind each property of /chemicalsearch/
+PROPERTY_COLUMNS = {
+    "MW": models.Chemical.MWValue,
+    "MP": models.Chemical.MPValue,
+    "BP": models.Chemical.BPValue,
+    "density": models.Chemical.densityValue,
+}
+
+
+def search_chemicals(
+    db: Session,
+    filters: ChemicalFilters,
+    orderBy: str,
+    descending: bool,
+    limit: int,
+    after: str | None,
+):
+    ## Range filters and ordering on the numeric property columns, all done by the database.
+    ## Sorting by a property leaves out chemicals without it. Pages are keyset ones like
+    ## paginate(), on (property, id): the cursor is the id of the last chemical sent.
+    query = db.query(models.Chemical)
+    for name, column in PROPERTY_COLUMNS.items():
+        low = getattr(filters, f"{name}Min")
+        high = getattr(filters, f"{name}Max")
+        if low is not None:
+            query = query.filter(column >= low)
+        if high is not None:
+            query = query.filter(column <= high)
+
+    sort_column = PROPERTY_COLUMNS.get(orderBy)
+    sort_key = (models.Chemical.id,)
+    if sort_column is not None:
+        query = query.filter(sort_column.isnot(None))
+        sort_key = (sort_column, models.Chemical.id)
+
+    if after:
+        last_id = decode_cursor(after)
+        last = db.query(*sort_key).filter(models.Chemical.id == last_id).first()
+        if last is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor.",
+            )
+        if descending:
+            query = query.filter(tuple_(*sort_key) < tuple_(*last))
+        else:
+            query = query.filter(tuple_(*sort_key) > tuple_(*last))
+
+    if descending:
+        query = query.order_by(*[column.desc() for column in sort_key])
+    else:
+        query = query.order_by(*sort_key)
+    rows = query.limit(limit + 1).all()
+
+    nextCursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        nextCursor = encode_cursor(rows[-1].id)
+
+    data = {"items": rows, "nextCursor": nextCursor}
+    return data
@@ -0,0 +1,389 @@
+import codecs
+import csv
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .. import models
+from .inventorysummary import StockChanges, apply_stock_changes, count_stock
+from .properties import property_values
+from .responsecache import invalidate_responses
+from .structure import structure_key, structure_skeletons
+from .writequeue import run_write
+from ..csvschema import (
+    CSVUserData,
+    CSVChemical,
+    CSVSupplier,
+    CSVOrder,
+    CSVRowError,
+)
+
+## SQLite caps the number of bound parameters per statement,
+## so IN lookups and bulk inserts are split into chunks of this size
+CHUNK_SIZE = 500
+
+## uploaded files are written to the database every BATCH_SIZE rows
+BATCH_SIZE = 1000
+
+## only the first few row errors are kept, so the report stays small for bad files
+MAX_REPORTED_ERRORS = 100
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _lookup_ids(db: Session, model, column, keys, chunk_size: int):
+    ## maps each key already in the database to its row id, using one IN query per chunk
+    found = {}
+    for chunk in _chunks(list(keys), chunk_size):
+        rows = db.execute(select(column, model.id).where(column.in_(chunk)))
+        for key, id in rows:
+            found[key] = id
+    return found
+
+
+def _bulk_insert(db: Session, model, rows: list[dict], chunk_size: int):
+    ## a list of parameter sets makes SQLAlchemy use executemany
+    for chunk in _chunks(rows, chunk_size):
+        db.execute(insert(model), chunk)
+
+
+def import_csv_data(
+    db: Session,
+    userDataList: list[CSVUserData],
+    chemicalList: list[CSVChemical],
+    supplierList: list[CSVSupplier],
+    orderList: list[CSVOrder],
+    chunk_size: int = CHUNK_SIZE,
+    commit: bool = True,
+):
+    ## Users are matched on username, chemicals on CAS and suppliers on supplierName.
+    ## Orders refer to chemicals by CAS and to suppliers by supplierName (or directly by id),
+    ## and are remapped to ids through dictionaries rather than by rescanning orderList.
+    ## Everything is written in a single transaction.
+
+    # Users #
+    new_users = {}
+    for user in userDataList:
+        new_users.setdefault(user.username, user)
+
+    existing_users = _lookup_ids(
+        db, models.User, models.User.username, new_users.keys(), chunk_size
+    )
+    user_rows = [
+        {"id": user.id, "username": user.username, "full_name": user.full_name}
+        for username, user in new_users.items()
+        if username not in existing_users
+    ]
+    _bulk_insert(db, models.User, user_rows, chunk_size)
+
+    # Chemicals #
+    new_chemicals = {}
+    for chemical in chemicalList:
+        new_chemicals.setdefault(chemical.CAS, chemical)
+
+    order_CAS = {
+        order.chemical for order in orderList if isinstance(order.chemical, str)
+    }
+    chemical_ids = _lookup_ids(
+        db,
+        models.Chemical,
+        models.Chemical.CAS,
+        new_chemicals.keys() | order_CAS,
+        chunk_size,
+    )
+    chemical_rows = [
+        {
+            "CAS": chemical.CAS,
+            "chemicalName": chemical.chemicalName,
+            "MW": chemical.MW,
+            "MP": chemical.MP,
+            "BP": chemical.BP,
+            "density": chemical.density,
+            **property_values(chemical.MW, chemical.MP, chemical.BP, chemical.density),
+            "smile": chemical.smile,
+            "inchi": chemical.inchi,
+            "structureKey": structure_key(chemical.inchi),
+        }
+        for CAS, chemical in new_chemicals.items()
+        if CAS not in chemical_ids
+    ]
+
+    _bulk_insert(db, models.Chemical, chemical_rows, chunk_size)
+    chemical_ids.update(
+        _lookup_ids(
+            db,
+            models.Chemical,
+            models.Chemical.CAS,
+            [row["CAS"] for row in chemical_rows],
+            chunk_size,
+        )
+    )
+
+    skeleton_rows = [
+        {"chemical_id": chemical_ids[row["CAS"]], "skeleton": skeleton}
+        for row in chemical_rows
+        for skeleton in structure_skeletons(row["inchi"])
+    ]
+    _bulk_insert(db, models.ChemicalSkeleton, skeleton_rows, chunk_size)
+
+    # Suppliers #
+    new_suppliers = {}
+    for supplier in supplierList:
+        new_suppliers.setdefault(supplier.supplierName, supplier)
+
+    order_supplierNames = {
+        order.supplier for order in orderList if isinstance(order.supplier, str)
+    }
+    supplier_ids = _lookup_ids(
+        db,
+        models.Supplier,
+        models.Supplier.supplierName,
+        new_suppliers.keys() | order_supplierNames,
+        chunk_size,
+    )
+    supplier_rows = [
+        {"supplierName": supplierName}
+        for supplierName in new_suppliers
+        if supplierName not in supplier_ids
+    ]
+    _bulk_insert(db, models.Supplier, supplier_rows, chunk_size)
+    supplier_ids.update(
+        _lookup_ids(
+            db,
+            models.Supplier,
+            models.Supplier.supplierName,
+            [row["supplierName"] for row in supplier_rows],
+            chunk_size,
+        )
+    )
+
+    # Orders #
+    ## orders whose chemical or supplier can't be resolved are skipped
+    order_rows = []
+    for order in orderList:
+        chemical_id = order.chemical
+        if isinstance(chemical_id, str):
+            chemical_id = chemical_ids.get(chemical_id)
+            if chemical_id is None:
+                continue
+
+        supplier_id = order.supplier
+        if isinstance(supplier_id, str):
+            supplier_id = supplier_ids.get(supplier_id)
+            if supplier_id is None:
+                continue
+
+        order_rows.append(
+            {
+                "user_id": order.user,
+                "chemical_id": chemical_id,
+                "supplier_id": supplier_id,
+                "amount": order.amount,
+                "status": order.status.value,
+                "amountUnit": order.amountUnit.value,
+                "supplierPN": order.supplierPN,
+            }
+        )
+    _bulk_insert(db, models.Order, order_rows, chunk_size)
+
+    ## imported orders can already be received (with no location, not consumed)
+    changes = StockChanges()
+    for order_row in order_rows:
+        count_stock(changes, {**order_row, "location_id": None, "isConsumed": False})
+    apply_stock_changes(db, changes)
+
+    if chemical_rows:
+        invalidate_responses(db, "chemicals")
+    if supplier_rows:
+        invalidate_responses(db, "suppliers")
+
+    if commit:
+        db.commit()
+
+    summary = {
+        "users": {
+            "inserted": len(user_rows),
+            "skipped": len(userDataList) - len(user_rows),
+        },
+        "chemicals": {
+            "inserted": len(chemical_rows),
+            "skipped": len(chemicalList) - len(chemical_rows),
+        },
+        "suppliers": {
+            "inserted": len(supplier_rows),
+            "skipped": len(supplierList) - len(supplier_rows),
+        },
+        "orders": {
+            "inserted": len(order_rows),
+            "skipped": len(orderList) - len(order_rows),
+        },
+    }
+    return summary
+
+
+def parse_csv_row(row: dict):
+    ## empty cells are treated as missing values
+    row = {key: value.strip() or None for key, value in row.items() if key and value}
+
+    user = None
+    if row.get("username"):
+        user = CSVUserData(
+            id=row.get("user_id"),
+            username=row.get("username"),
+            full_name=row.get("full_name"),
+        )
+
+    chemical = None
+    if row.get("chemicalName"):
+        chemical = CSVChemical(
+            CAS=row.get("CAS"),
+            chemicalName=row.get("chemicalName"),
+            MW=row.get("MW"),
+            MP=row.get("MP"),
+            BP=row.get("BP"),
+            density=row.get("density"),
+            smile=row.get("smile"),
+            inchi=row.get("inchi"),
+        )
+
+    supplier = CSVSupplier(supplierName=row.get("supplierName"))
+
+    order = CSVOrder(
+        user=row.get("user_id"),
+        chemical=row.get("CAS"),
+        supplier=row.get("supplierName"),
+        status=row.get("status"),
+        amount=row.get("amount"),
+        amountUnit=row.get("amountUnit"),
+        supplierPN=row.get("supplierPN"),
+    )
+
+    return user, chemical, supplier, order
+
+
+def _decoded_lines(file, bad_lines: set):
+    ## decodes the file a line at a time, so a line that isn't UTF-8 only fails its row:
+    ## it is replaced and its number added to bad_lines
+    for line_number, line in enumerate(file, start=1):
+        try:
+            yield line.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            bad_lines.add(line_number)
+            yield line.decode("utf-8-sig", errors="replace")
+
+
+def ingest_csv_file(db: Session, file, batch_size: int = BATCH_SIZE, on_progress=None):
+    ## Reads an uploaded CSV file (one order per row, see CSV_COLUMNS) row by row.
+    ## Rows are validated one at a time and written every batch_size rows,
+    ## so only a single batch is held in memory whatever the size of the file.
+    ## Invalid rows are reported and skipped rather than aborting the upload: rows that
+    ## can't be read or validated, and rows the database rejects (a batch that fails is
+    ## rolled back and written again one row at a time).
+    ## If the database fails altogether, the report of what was committed so far is
+    ## returned with "aborted" set.
+    ## Each batch (and each row of a batch that is retried) is a write of its own,
+    ## so with the write queue other writes get in between batches.
+    ## on_progress(report) is called after each batch has been committed.
+    report = {
+        "rowsRead": 0,
+        "rowsFailed": 0,
+        "batches": 0,
+        "summary": {
+            name: {"inserted": 0, "skipped": 0}
+            for name in ("users", "chemicals", "suppliers", "orders")
+        },
+        "errors": [],
+        "aborted": None,
+    }
+    ## (row number, user, chemical, supplier, order) of each row in the batch
+    batch = []
+
+    def fail_row(row_number: int, detail: str):
+        report["rowsFailed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append(
+                CSVRowError(row=row_number, detail=detail).model_dump()
+            )
+
+    def write_rows(rows: list):
+        summary = run_write(
+            db,
+            lambda session: import_csv_data(
+                db=session,
+                userDataList=[user for _, user, _, _, _ in rows if user],
+                chemicalList=[chemical for _, _, chemical, _, _ in rows if chemical],
+                supplierList=[supplier for _, _, _, supplier, _ in rows],
+                orderList=[order for _, _, _, _, order in rows],
+            ),
+        )
+        for name, counts in summary.items():
+            report["summary"][name]["inserted"] += counts["inserted"]
+            report["summary"][name]["skipped"] += counts["skipped"]
+
+    def flush():
+        if not batch:
+            return
+        try:
+            write_rows(batch)
+        except (IntegrityError, DataError):
+            db.rollback()
+            for row in batch:
+                try:
+                    write_rows([row])
+                except (IntegrityError, DataError) as error:
+                    db.rollback()
+                    fail_row(row[0], str(error.orig))
+        report["batches"] += 1
+        batch.clear()
+        if on_progress:
+            on_progress(report)
+
+    bad_lines = set()
+    reader = csv.DictReader(_decoded_lines(file, bad_lines))
+    row_number = 0
+    lines_read = 0
+    try:
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as error:
+                row_number += 1
+                report["rowsRead"] += 1
+                fail_row(row_number, f"unreadable row: {error}")
+                continue
+
+            row_number += 1
+            report["rowsRead"] += 1
+            row_lines = range(lines_read + 1, reader.line_num + 1)
+            lines_read = reader.line_num
+            if any(line in bad_lines for line in row_lines):
+                fail_row(row_number, "the row isn't valid UTF-8")
+                continue
+
+            try:
+                user, chemical, supplier, order = parse_csv_row(row)
+            except ValidationError as error:
+                fail_row(row_number, str(error))
+                continue
+
+            batch.append((row_number, user, chemical, supplier, order))
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+    except SQLAlchemyError as error:
+        db.rollback()
+        report["aborted"] = (
+            f"stopped at row {row_number}, the batch being written was rolled back: "
+            f"{error}"
+        )
+    ## rows the database rejected are only known once their batch is written
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
@@ -0,0 +1,99 @@
+import csv
+import io
+
+import orjson
+from sqlalchemy import select
+
+from .. import models
+from ..csvschema import CSV_COLUMNS
+from ..database import SessionLocal
+from ..schemas import OrderFilters
+from .order import (
+    ORDER_COLUMNS,
+    _with_order_joins,
+    _order_from_row,
+    order_filter_conditions,
+)
+
+## rows are fetched from the database and sent on this many at a time,
+## so an export holds a single batch in memory however many rows it has
+EXPORT_BATCH_SIZE = 1000
+
+## the fields of the Chemical schema
+CHEMICAL_COLUMNS = [
+    "id",
+    "CAS",
+    "chemicalName",
+    "MW",
+    "MP",
+    "BP",
+    "density",
+    "smile",
+    "inchi",
+]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _stream(statement, encode_batch, header: bytes = b""):
+    ## A generator for a StreamingResponse. It has its own session, which is only opened
+    ## once the response starts and is closed when it ends (or the client goes away).
+    ## yield_per fetches the rows in batches (a server-side cursor on Postgres).
+    db = SessionLocal()
+    try:
+        if header:
+            yield header
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield encode_batch(rows)
+    finally:
+        db.close()
+
+
+def _ndjson_batch(records):
+    return b"".join(orjson.dumps(record) + b"\n" for record in records)
+
+
+def _csv_batch(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_header(columns: list[str]):
+    return _csv_batch([columns])
+
+
+def stream_orders(filters: OrderFilters, format: str):
+    ## ndjson: one Order per line
+    ## csv: one order per row in the CSV_COLUMNS layout, which /csv/upload/ takes back
+    ## (the location, isConsumed and orderDate of an order are not part of that layout)
+    statement = (
+        _with_order_joins(select(*ORDER_COLUMNS))
+        .where(*order_filter_conditions(filters))
+        .order_by(models.Order.id)
+    )
+
+    if format == "csv":
+        return _stream(
+            statement,
+            lambda rows: _csv_batch(
+                [[getattr(row, column) for column in CSV_COLUMNS] for row in rows]
+            ),
+            header=_csv_header(CSV_COLUMNS),
+        )
+
+    return _stream(
+        statement, lambda rows: _ndjson_batch(_order_from_row(row) for row in rows)
+    )
+
+
+def stream_chemicals(format: str):
+    statement = select(
+        *[getattr(models.Chemical, column) for column in CHEMICAL_COLUMNS]
+    ).order_by(models.Chemical.id)
+
+    if format == "csv":
+        return _stream(statement, _csv_batch, header=_csv_header(CHEMICAL_COLUMNS))
+
+    return _stream(statement, lambda rows: _ndjson_batch(row._asdict() for row in rows))
@@ -0,0 +1,23 @@
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from .. import config
+
+## With FAST_JSON, the big list endpoints return a ready-made response instead of data for
+## FastAPI to validate against response_model, dump to plain Python and then encode with
+## the json module. Data built by our own queries in the shape of the response model
+## (trusted) goes straight to orjson, anything else (e.g. ORM objects) is validated and
+## encoded in a single pass by a TypeAdapter of the response model.
+## See benchmarks/json_responses.py.
+
+
+def json_response(data, adapter: TypeAdapter, trusted: bool = False):
+    if not config.FAST_JSON:
+        return data
+
+    if trusted:
+        return ORJSONResponse(data)
+
+    content = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return Response(content=content, media_type="application/json")
@@ -0,0 +1,273 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .. import config, models
+from ..csvschema import CSVGlobal
+from ..database import SessionLocal
+from .csvimport import import_csv_data
+from .writequeue import run_write
+
+logger = logging.getLogger(__name__)
+
+## orders are imported (and progress is saved) this many rows at a time
+JOB_CHUNK_SIZE = config.IMPORT_JOB_CHUNK_SIZE
+
+## a running job that hasn't saved progress for this long is assumed to belong to a dead worker
+JOB_STALE_AFTER = timedelta(seconds=config.IMPORT_JOB_STALE_AFTER)
+
+## a single worker thread, so that imports don't compete with each other for the write lock
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="csv-import")
+
+
+def add_new_import_job(db: Session, user_id: int, csvData: CSVGlobal):
+    db_job = models.ImportJob(
+        user_id=user_id,
+        payload=csvData.model_dump_json(),
+        rowsTotal=len(csvData.orderList),
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_import_job(db: Session, job_id: int):
+    job = db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    rowsPerSecond = None
+    if job.startedAt:
+        elapsed = (
+            (job.finishedAt or datetime.utcnow()) - job.startedAt
+        ).total_seconds()
+        if elapsed > 0:
+            rowsPerSecond = round(job.rowsDone / elapsed, 1)
+
+    data = {
+        "id": job.id,
+        "status": job.status,
+        "rowsTotal": job.rowsTotal,
+        "rowsDone": job.rowsDone,
+        "rowsFailed": job.rowsFailed,
+        "rowsPerSecond": rowsPerSecond,
+        "summary": json.loads(job.summary) if job.summary else None,
+        "error": job.error,
+        "createdAt": job.createdAt,
+        "startedAt": job.startedAt,
+        "finishedAt": job.finishedAt,
+    }
+    return data
+
+
+def submit_import_job(job_id: int):
+    executor.submit(run_import_job, job_id)
+
+
+## Saves progress, with the rows it describes, only if the job is still this run's:
+## heartbeatAt is the value this run last wrote, and a worker that took the job over
+## (see resume_import_jobs) has written its own. False if the job was taken over.
+def _save_progress(db: Session, job_id: int, heartbeat: datetime, **values):
+    saved = db.execute(
+        update(models.ImportJob)
+        .where(
+            models.ImportJob.id == job_id,
+            models.ImportJob.status == "running",
+            models.ImportJob.heartbeatAt == heartbeat,
+        )
+        .values(**values)
+    ).rowcount
+    if not saved:
+        db.rollback()
+        logger.warning("import job taken over", extra={"job_id": job_id})
+        return False
+    db.commit()
+    return True
+
+
+## a job that couldn't be claimed is still queued, so it is failed without the heartbeat
+## check of _save_progress (this run never wrote one)
+def _fail_queued_job(db: Session, job_id: int, error: str):
+    db.execute(
+        update(models.ImportJob)
+        .where(
+            models.ImportJob.id == job_id,
+            models.ImportJob.status == "queued",
+        )
+        .values(status="failed", error=error, finishedAt=datetime.utcnow())
+    )
+    db.commit()
+
+
+def _claim_job(db: Session, job_id: int, heartbeat: datetime):
+    claimed = db.execute(
+        update(models.ImportJob)
+        .where(
+            models.ImportJob.id == job_id,
+            models.ImportJob.status == "queued",
+        )
+        .values(status="running", heartbeatAt=heartbeat)
+    ).rowcount
+    db.commit()
+    return claimed
+
+
+## Imports one chunk and saves the progress it makes, in one transaction that is
+## rolled back if the job was taken over. Returns the progress that was saved,
+## None if the job was taken over.
+def _import_chunk(
+    db: Session,
+    job_id: int,
+    heartbeat: datetime,
+    csvData: CSVGlobal,
+    chunk: list,
+    first: bool,
+    progress: dict,
+):
+    ## users, chemicals and suppliers go in with the first chunk,
+    ## later chunks find them in the database
+    counts = import_csv_data(
+        db=db,
+        userDataList=csvData.userDataList if first else [],
+        chemicalList=csvData.chemicalList if first else [],
+        supplierList=csvData.supplierList if first else [],
+        orderList=chunk,
+        commit=False,
+    )
+
+    summary = json.loads(progress["summary"]) if progress["summary"] else None
+    if summary is None:
+        summary = counts
+    else:
+        for name, count in counts.items():
+            summary[name]["inserted"] += count["inserted"]
+            summary[name]["skipped"] += count["skipped"]
+
+    progress = {
+        **progress,
+        "rowsFailed": progress["rowsFailed"] + counts["orders"]["skipped"],
+        "summary": json.dumps(summary),
+    }
+    if not _save_progress(db, job_id, heartbeat, **progress):
+        return None
+    return progress
+
+
+## Each step (the claim, every chunk with its progress, the final status) is a write of its
+## own, so with the write queue a big import doesn't hold up other writes.
+def run_import_job(job_id: int):
+    db = SessionLocal()
+    try:
+        ## claim the job, so that it can't be picked up twice
+        heartbeat = datetime.utcnow()
+        try:
+            claimed = run_write(
+                db, lambda session: _claim_job(session, job_id, heartbeat)
+            )
+        except Exception as error:
+            db.rollback()
+            run_write(db, lambda session: _fail_queued_job(session, job_id, str(error)))
+            return
+        if claimed:
+            _run_claimed_job(db, job_id, heartbeat)
+    finally:
+        db.close()
+
+
+def _run_claimed_job(db: Session, job_id: int, heartbeat: datetime):
+    try:
+        job = db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+        startedAt = job.startedAt or datetime.utcnow()
+        rowsFailed = job.rowsFailed
+
+        csvData = CSVGlobal.model_validate_json(job.payload)
+        orderList = csvData.orderList
+        summary = job.summary
+
+        ## resumes after the last saved chunk if the job was interrupted
+        offsets = range(job.rowsDone, len(orderList), JOB_CHUNK_SIZE) or [job.rowsDone]
+        for offset in offsets:
+            chunk = orderList[offset : offset + JOB_CHUNK_SIZE]
+
+            ## progress is committed together with the rows it describes
+            progress = {
+                "startedAt": startedAt,
+                "rowsDone": offset + len(chunk),
+                "rowsFailed": rowsFailed,
+                "summary": summary,
+                "heartbeatAt": datetime.utcnow(),
+            }
+            progress = run_write(
+                db,
+                ## users, chemicals and suppliers only with the job's first chunk,
+                ## not again with the first chunk of a resumed job
+                lambda session: _import_chunk(
+                    session, job_id, heartbeat, csvData, chunk, offset == 0, progress
+                ),
+            )
+            if progress is None:
+                return
+            heartbeat = progress["heartbeatAt"]
+            rowsFailed = progress["rowsFailed"]
+            summary = progress["summary"]
+
+        run_write(
+            db,
+            lambda session: _save_progress(
+                session,
+                job_id,
+                heartbeat,
+                status="completed",
+                finishedAt=datetime.utcnow(),
+            ),
+        )
+
+    except Exception as error:
+        db.rollback()
+        run_write(
+            db,
+            lambda session: _save_progress(
+                session,
+                job_id,
+                heartbeat,
+                status="failed",
+                error=str(error),
+                finishedAt=datetime.utcnow(),
+            ),
+        )
+
+
+def _requeue_stale_jobs(db: Session):
+    db.execute(
+        update(models.ImportJob)
+        .where(
+            models.ImportJob.status == "running",
+            models.ImportJob.heartbeatAt < datetime.utcnow() - JOB_STALE_AFTER,
+        )
+        .values(status="queued")
+    )
+    db.commit()
+
+
+def resume_import_jobs():
+    ## requeues jobs left running by a worker that has since stopped,
+    ## then resubmits everything that is still waiting
+    db = SessionLocal()
+    try:
+        run_write(db, _requeue_stale_jobs)
+
+        job_ids = db.scalars(
+            select(models.ImportJob.id).where(models.ImportJob.status == "queued")
+        ).all()
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        submit_import_job(job_id)
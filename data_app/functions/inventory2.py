@@ -1,30 +1,61 @@
+import logging
+
 from fastapi import HTTPException, status
 from sqlalchemy import and_
 from sqlalchemy.orm import Session, selectinload
 
 from .. import models
+from ..database import lock_for_write
 from ..schemas import InventoryPatch
+from .inventorysummary import (
+    StockChanges,
+    apply_stock_changes,
+    count_stock,
+    stock_fields,
+)
+
+logger = logging.getLogger(__name__)
 
 
 def patch_inventory_amount_location(db: Session, order: InventoryPatch):
-    patch_order = db.query(models.Order).filter(models.Order.id == order.id).first()
+    lock_for_write(db)
+    patch_order = (
+        db.query(models.Order)
+        .filter(models.Order.id == order.id)
+        .with_for_update()
+        .first()
+    )
 
     if not patch_order:
         raise HTTPException(status_code=404, detail="Order not found ??")
 
+    changes = StockChanges()
+    count_stock(changes, stock_fields(patch_order), -1)
     patch_order.amount = order.amount
     patch_order.location_id = order.location_id
     patch_order.isConsumed = order.isConsumed
+    count_stock(changes, stock_fields(patch_order))
+    apply_stock_changes(db, changes)
     db.commit()
     return patch_order
 
 
 def patch_inventory_status(db: Session, order_id: int):
-    print("order_id: ", order_id)
-    patch_order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    logger.debug("inventory status", extra={"order_id": order_id})
+    lock_for_write(db)
+    patch_order = (
+        db.query(models.Order)
+        .filter(models.Order.id == order_id)
+        .with_for_update()
+        .first()
+    )
 
     if not patch_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    changes = StockChanges()
+    count_stock(changes, stock_fields(patch_order), -1)
     patch_order.status = "received"
+    count_stock(changes, stock_fields(patch_order))
+    apply_stock_changes(db, changes)
     db.commit()
@@ -0,0 +1,201 @@
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, lock_for_write, native_insert
+from .analytics import GRAMS, IN_STOCK, MILLILITRES
+
+## inventory_summary holds the stock of each (user, location, chemical), so reading a user's
+## stock doesn't go through all of their orders. Every write that changes an order's stock
+## (its user, location, chemical, status, isConsumed, amount or unit) records the change in a
+## StockChanges, taking the order out with its old values and back in with its new ones,
+## and applies it with apply_stock_changes() in the same transaction. The old values are
+## read with the order locked (see lock_for_write), or a write to the same order at the
+## same time could take the same values out again.
+## Orders with no location are kept under location_id 0, and orders with no user or no
+## chemical (e.g. imported without one) are left out: a NULL in the key never conflicts,
+## so every change to them would add a row rather than update one.
+## rebuild_inventory_summary() starts over from the orders:
+##   python -m data_app.functions.inventorysummary
+
+STOCK_FIELDS = (
+    "user_id",
+    "location_id",
+    "chemical_id",
+    "status",
+    "isConsumed",
+    "amount",
+    "amountUnit",
+)
+
+## the same normalization as GRAMS and MILLILITRES
+GRAMS_PER_UNIT = {"mg": 0.001, "g": 1.0}
+MILLILITRES_PER_UNIT = {"mL": 1.0, "L": 1000.0}
+
+SUMMARY_KEY = (
+    models.InventorySummary.user_id,
+    models.InventorySummary.location_id,
+    models.InventorySummary.chemical_id,
+)
+
+## the orders that count towards the summary
+IN_SUMMARY = (
+    *IN_STOCK,
+    models.Order.user_id.is_not(None),
+    models.Order.chemical_id.is_not(None),
+)
+
+
+class StockChanges(defaultdict):
+    ## (user_id, location_id, chemical_id) -> [orders, grams, millilitres] to add
+    def __init__(self):
+        super().__init__(lambda: [0, 0.0, 0.0])
+
+
+def stock_fields(order: models.Order):
+    return {field: getattr(order, field) for field in STOCK_FIELDS}
+
+
+def count_stock(changes: StockChanges, order: dict, sign: int = 1):
+    ## order: the STOCK_FIELDS of an order, sign: 1 to add it, -1 to take it out
+    ## the same test as IN_STOCK, so a NULL isConsumed isn't in stock either
+    if order["status"] != "received" or order["isConsumed"] is not False:
+        return
+    if order["user_id"] is None or order["chemical_id"] is None:
+        return
+    amount = order["amount"] or 0
+    unit = order["amountUnit"]
+    change = changes[
+        (order["user_id"], order["location_id"] or 0, order["chemical_id"])
+    ]
+    change[0] += sign
+    change[1] += sign * amount * GRAMS_PER_UNIT.get(unit, 0.0)
+    change[2] += sign * amount * MILLILITRES_PER_UNIT.get(unit, 0.0)
+
+
+def apply_stock_changes(db: Session, changes: StockChanges):
+    rows = [
+        {
+            "user_id": user_id,
+            "location_id": location_id,
+            "chemical_id": chemical_id,
+            "orders": orders,
+            "grams": grams,
+            "millilitres": millilitres,
+        }
+        for (user_id, location_id, chemical_id), (
+            orders,
+            grams,
+            millilitres,
+        ) in changes.items()
+        if orders or grams or millilitres
+    ]
+    if not rows:
+        return
+
+    statement = native_insert(models.InventorySummary)
+    statement = statement.on_conflict_do_update(
+        index_elements=[column.name for column in SUMMARY_KEY],
+        set_={
+            "orders": models.InventorySummary.orders + statement.excluded.orders,
+            "grams": models.InventorySummary.grams + statement.excluded.grams,
+            "millilitres": models.InventorySummary.millilitres
+            + statement.excluded.millilitres,
+        },
+    )
+    db.execute(statement, rows)
+
+    ## nothing left in stock
+    db.execute(
+        delete(models.InventorySummary).where(
+            models.InventorySummary.user_id.in_({row["user_id"] for row in rows}),
+            models.InventorySummary.orders <= 0,
+        )
+    )
+
+
+def count_stock_in_database(
+    db: Session, changes: StockChanges, *conditions, sign: int = -1
+):
+    ## for writes that change many orders at once (e.g. deleting a supplier's orders):
+    ## the stock of the orders matching conditions, added up by the database.
+    ## The orders are locked first, an aggregate can't be read FOR UPDATE
+    lock_for_write(db)
+    db.execute(select(models.Order.id).where(*conditions).with_for_update())
+    location_id = func.coalesce(models.Order.location_id, 0)
+    rows = db.execute(
+        select(
+            models.Order.user_id,
+            location_id,
+            models.Order.chemical_id,
+            func.count(models.Order.id),
+            func.sum(GRAMS),
+            func.sum(MILLILITRES),
+        )
+        .where(*IN_SUMMARY, *conditions)
+        .group_by(models.Order.user_id, location_id, models.Order.chemical_id)
+    )
+    for user_id, location_id, chemical_id, orders, grams, millilitres in rows:
+        change = changes[(user_id, location_id, chemical_id)]
+        change[0] += sign * orders
+        change[1] += sign * grams
+        change[2] += sign * millilitres
+
+
+def get_inventory_summary(db: Session, user_id: int):
+    rows = db.execute(
+        select(
+            models.InventorySummary.location_id,
+            models.Location.locationName,
+            models.InventorySummary.chemical_id,
+            models.Chemical.CAS,
+            models.Chemical.chemicalName,
+            models.InventorySummary.orders,
+            models.InventorySummary.grams,
+            models.InventorySummary.millilitres,
+        )
+        .join(
+            models.Chemical, models.InventorySummary.chemical_id == models.Chemical.id
+        )
+        .outerjoin(
+            models.Location, models.InventorySummary.location_id == models.Location.id
+        )
+        .where(models.InventorySummary.user_id == user_id)
+        .order_by(models.InventorySummary.location_id, models.Chemical.chemicalName)
+    )
+
+    summaryList = []
+    for row in rows:
+        item = row._asdict()
+        item["location_id"] = item["location_id"] or None
+        summaryList.append(item)
+    return summaryList
+
+
+def rebuild_inventory_summary(db: Session):
+    location_id = func.coalesce(models.Order.location_id, 0)
+    db.execute(delete(models.InventorySummary))
+    db.execute(
+        insert(models.InventorySummary).from_select(
+            ["user_id", "location_id", "chemical_id", "orders", "grams", "millilitres"],
+            select(
+                models.Order.user_id,
+                location_id,
+                models.Order.chemical_id,
+                func.count(models.Order.id),
+                func.sum(GRAMS),
+                func.sum(MILLILITRES),
+            )
+            .where(*IN_SUMMARY)
+            .group_by(models.Order.user_id, location_id, models.Order.chemical_id),
+        )
+    )
+    db.commit()
+    return db.scalar(select(func.count(models.InventorySummary.id)))
+
+
+if __name__ == "__main__":
+    with SessionLocal() as db:
+        print(f"inventory_summary rebuilt, {rebuild_inventory_summary(db)} rows")
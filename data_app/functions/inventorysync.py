@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .. import models
+from .location import get_locations_list_async
+from .order import get_orders_list_async
+
+## A write can be committed a little after the updatedAt it was given, so each sync
+## looks back this far before its token. Rows sent twice are just upserted again.
+SYNC_OVERLAP = timedelta(seconds=30)
+
+## tombstones are kept this long, a client that last synced before that gets everything again
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+## sync tokens are opaque to the client: the time the sync was made, base64 encoded
+def encode_sync_token(syncedAt: datetime):
+    return base64.urlsafe_b64encode(
+        json.dumps({"t": syncedAt.isoformat()}).encode()
+    ).decode()
+
+
+def decode_sync_token(since: str):
+    try:
+        token = json.loads(base64.urlsafe_b64decode(since.encode()))
+        return datetime.fromisoformat(token["t"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token.",
+        )
+
+
+## deletes through the ORM (including cascades from users, chemicals and suppliers)
+## leave a tombstone, bulk DELETE statements have to add their own
+@event.listens_for(models.Order, "after_delete")
+def add_order_tombstone(mapper, connection, target):
+    connection.execute(
+        insert(models.Tombstone).values(
+            entity="order", entity_id=target.id, user_id=target.user_id
+        )
+    )
+
+
+@event.listens_for(models.Location, "after_delete")
+def add_location_tombstone(mapper, connection, target):
+    connection.execute(
+        insert(models.Tombstone).values(
+            entity="location", entity_id=target.id, user_id=target.user_id
+        )
+    )
+
+
+async def get_inventory_changes(db: AsyncSession, user_id: int, since: str | None):
+    syncedAt = datetime.utcnow()
+
+    changedSince = None
+    if since:
+        changedSince = decode_sync_token(since) - SYNC_OVERLAP
+        ## deletions from before then may have been pruned
+        if changedSince < syncedAt - TOMBSTONE_RETENTION:
+            changedSince = None
+
+    locationsList = await get_locations_list_async(
+        db=db, user_id=user_id, since=changedSince
+    )
+    ordersList = await get_orders_list_async(db=db, user_id=user_id, since=changedSince)
+
+    deletedLocations = []
+    deletedOrders = []
+    if changedSince is not None:
+        tombstones = await db.execute(
+            select(models.Tombstone.entity, models.Tombstone.entity_id).where(
+                models.Tombstone.user_id == user_id,
+                models.Tombstone.deletedAt >= changedSince,
+            )
+        )
+        for entity, entity_id in tombstones:
+            if entity == "location":
+                deletedLocations.append(entity_id)
+            else:
+                deletedOrders.append(entity_id)
+
+    data = {
+        "locationsList": locationsList,
+        "ordersList": ordersList,
+        "deletedLocations": deletedLocations,
+        "deletedOrders": deletedOrders,
+        "syncToken": encode_sync_token(syncedAt),
+        "full": changedSince is None,
+    }
+    return data
+
+
+def prune_tombstones(db: Session):
+    db.execute(
+        delete(models.Tombstone).where(
+            models.Tombstone.deletedAt < datetime.utcnow() - TOMBSTONE_RETENTION
+        )
+    )
+    db.commit()
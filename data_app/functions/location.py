@@ -1,17 +1,26 @@
+from datetime import datetime
+
 from fastapi import HTTPException, status
-from sqlalchemy import and_
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from .. import models
+from .inventorysummary import StockChanges, apply_stock_changes, count_stock_in_database
 
 
-def get_locations_list(db: Session, user_id: int):
-    locationsList = (
-        db.query(models.Location)
-        .filter(models.Location.user_id == user_id)
-        .options(selectinload(models.Location.user))
-        .all()
+async def get_locations_list_async(
+    db: AsyncSession, user_id: int, since: datetime | None = None
+):
+    ## since: only locations that changed from then on
+    ## plain dicts in the shape of Location, rather than ORM objects
+    statement = select(models.Location.id, models.Location.locationName).where(
+        models.Location.user_id == user_id
     )
+    if since is not None:
+        statement = statement.where(models.Location.updatedAt >= since)
+
+    locationsList = [row._asdict() for row in await db.execute(statement)]
     return locationsList
 
 
@@ -51,5 +60,13 @@ def remove_location(db: Session, user_id: int, location_id: int):
     if not rm_location:
         raise HTTPException(status_code=404, detail="Location not found")
 
+    ## its orders stay, with no location, so their stock moves to location 0
+    changes = StockChanges()
+    condition = models.Order.location_id == location_id
+    count_stock_in_database(db, changes, condition, sign=-1)
+    for (user_id, _, chemical_id), change in list(changes.items()):
+        changes[(user_id, 0, chemical_id)] = [-value for value in change]
+    apply_stock_changes(db, changes)
+
     db.delete(rm_location)
     db.commit()
@@ -0,0 +1,47 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+## The app logs through the "data_app" logger, one JSON object per line on stderr: the time,
+## level, logger and message, plus the fields passed with extra={...}, e.g.
+##   logger.debug("orders list", extra={"user_id": user_id})
+## LOG_LEVEL sets the lowest level written (DEBUG, INFO, WARNING, ERROR), OFF writes nothing.
+
+## attributes every LogRecord has, the rest came from extra
+RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {
+    "message",
+    "asctime",
+}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level: str):
+    logger = logging.getLogger("data_app")
+    logger.handlers.clear()
+    logger.propagate = False
+
+    if level.upper() == "OFF":
+        logger.disabled = True
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.disabled = False
@@ -0,0 +1,261 @@
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.routing import Match
+
+## Request and database metrics of this worker, kept in memory and served by /metrics
+## in the Prometheus text format:
+##   http_requests_total{method,route,status}              counter
+##   http_requests_in_flight                                gauge
+##   http_request_duration_seconds{method,route}           histogram
+##   http_request_db_queries{method,route}                 histogram, statements per request
+##   http_request_db_duration_seconds{method,route}        histogram, database time per request
+##   db_pool_checkout_duration_seconds                     histogram, waiting for a connection
+##   db_pool_checked_out, db_pool_size, db_pool_overflow   gauges, of the sync engine
+## route is the path template of the endpoint, so ids in query strings don't add series.
+## Statements are counted for the request whose context runs them: endpoints, their
+## dependencies and (see functions/writequeue.py) the jobs they hand to the writer thread.
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+metrics_lock = threading.Lock()
+
+
+def _labels(names: tuple, values: tuple):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, *values, amount: float = 1):
+        with metrics_lock:
+            self.series[values] = self.series.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, total in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *values):
+        self.inc(*values, amount=-1)
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        ## label values -> [count in each bucket (and above the last one), sum]
+        self.series = {}
+
+    def observe(self, value: float, *values):
+        with metrics_lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = _labels((*self.labels, "le"), (*values, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+requests_total = Counter(
+    "http_requests_total",
+    "Requests by route and status.",
+    ("method", "route", "status"),
+)
+requests_in_flight = Gauge("http_requests_in_flight", "Requests being handled.")
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request.",
+    LATENCY_BUCKETS,
+    ("method", "route"),
+)
+request_db_queries = Histogram(
+    "http_request_db_queries",
+    "SQL statements run for a request.",
+    QUERY_BUCKETS,
+    ("method", "route"),
+)
+request_db_duration = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent running SQL statements for a request.",
+    LATENCY_BUCKETS,
+    ("method", "route"),
+)
+pool_checkout_duration = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to get a connection from the pool, opening a new one included.",
+    LATENCY_BUCKETS,
+)
+
+METRICS = (
+    requests_total,
+    requests_in_flight,
+    request_duration,
+    request_db_queries,
+    request_db_duration,
+    pool_checkout_duration,
+)
+
+
+## the statements of the request being handled
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_start = time.perf_counter()
+
+
+def end_query(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += time.perf_counter() - context.metrics_start
+
+
+def instrument_engine(engine):
+    ## engine: a sync Engine, or the sync_engine of an AsyncEngine
+    event.listen(engine, "before_cursor_execute", start_query)
+    event.listen(engine, "after_cursor_execute", end_query)
+
+
+## pools that time their checkouts, passed as poolclass to the engines
+class TimedCheckout:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_checkout_duration.observe(time.perf_counter() - start)
+
+
+## (logging under SQLAlchemy's pool loggers, rather than this module's)
+class TimedQueuePool(TimedCheckout, QueuePool):
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.QueuePool"
+
+
+class TimedAsyncAdaptedQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+
+def route_of(scope):
+    ## the path template of the route that handled the request
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            requests_in_flight.dec()
+            request_stats.reset(token)
+
+            method = scope["method"]
+            route = route_of(scope)
+            requests_total.inc(method, route, status_code)
+            request_duration.observe(duration, method, route)
+            request_db_queries.observe(stats.queries, method, route)
+            request_db_duration.observe(stats.seconds, method, route)
+            logger.debug(
+                "request",
+                extra={
+                    "method": method,
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 2),
+                    "db_queries": stats.queries,
+                    "db_ms": round(stats.seconds * 1000, 2),
+                },
+            )
+
+
+def render_metrics(pool: dict):
+    ## pool: pool_stats() of the sync engine
+    lines = []
+    with metrics_lock:
+        for metric in METRICS:
+            lines.extend(metric.render())
+    for name, key in (
+        ("db_pool_checked_out", "checkedOut"),
+        ("db_pool_size", "poolSize"),
+        ("db_pool_overflow", "overflow"),
+    ):
+        if pool.get(key) is not None:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {pool[key]}")
+    return "\n".join(lines) + "\n"
@@ -1,150 +1,317 @@
+import logging
+from datetime import datetime
+
 from fastapi import HTTPException, status
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import or_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from .. import models
-from ..schemas import OrderIn, Order
+from ..database import lock_for_write
+from ..schemas import Order, OrderFilters
+from .inventorysummary import (
+    StockChanges,
+    apply_stock_changes,
+    count_stock,
+    stock_fields,
+)
+from .pagination import paginate
+from .search import search_hits
+from .structure import structure_key, skeleton_of
 
+logger = logging.getLogger(__name__)
 
-def get_orders_list(db: Session, user_id: int):
-    print("user_id: ", user_id)
 
-    if user_id == "all":
-        ordersList = (
-            db.query(models.Order)
-            .options(
-                selectinload(models.Order.user),
-                selectinload(models.Order.chemical),
-                selectinload(models.Order.supplier),
-                selectinload(models.Order.location),
-            )
-            .all()
-        )
-    else:
-        ordersList = (
-            db.query(models.Order)
-            .filter(models.Order.user_id == user_id)
-            .options(
-                selectinload(models.Order.user),
-                selectinload(models.Order.chemical),
-                selectinload(models.Order.supplier),
-                selectinload(models.Order.location),
-            )
-            .all()
-        )
+## only the columns the Order schema needs, in a single joined query,
+## so listing orders doesn't build ORM objects for every order and related row
+ORDER_COLUMNS = (
+    models.Order.id,
+    models.Order.user_id,
+    models.Order.chemical_id,
+    models.Order.supplier_id,
+    models.Order.location_id,
+    models.Order.status,
+    models.Order.amount,
+    models.Order.amountUnit,
+    models.Order.isConsumed,
+    models.Order.orderDate,
+    models.Order.supplierPN,
+    models.User.username,
+    models.User.full_name,
+    models.Chemical.CAS,
+    models.Chemical.chemicalName,
+    models.Chemical.MW,
+    models.Chemical.MP,
+    models.Chemical.BP,
+    models.Chemical.density,
+    models.Chemical.smile,
+    models.Chemical.inchi,
+    models.Supplier.supplierName,
+    models.Location.locationName,
+)
+
+
+## works on both a Query and a select()
+def _with_order_joins(query):
+    return (
+        query.join(models.User, models.Order.user_id == models.User.id)
+        .join(models.Chemical, models.Order.chemical_id == models.Chemical.id)
+        .join(models.Supplier, models.Order.supplier_id == models.Supplier.id)
+        .outerjoin(models.Location, models.Order.location_id == models.Location.id)
+    )
+
+
+def _orders_projection(db: Session):
+    return _with_order_joins(db.query(*ORDER_COLUMNS))
+
+
+def _order_from_row(row):
+    ## same shape as the Order schema
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "chemical_id": row.chemical_id,
+        "supplier_id": row.supplier_id,
+        "location_id": row.location_id,
+        "status": row.status,
+        "amount": row.amount,
+        "amountUnit": row.amountUnit,
+        "isConsumed": row.isConsumed,
+        "orderDate": row.orderDate,
+        "supplierPN": row.supplierPN,
+        "user": {
+            "id": row.user_id,
+            "username": row.username,
+            "full_name": row.full_name,
+        },
+        "chemical": {
+            "id": row.chemical_id,
+            "CAS": row.CAS,
+            "chemicalName": row.chemicalName,
+            "MW": row.MW,
+            "MP": row.MP,
+            "BP": row.BP,
+            "density": row.density,
+            "smile": row.smile,
+            "inchi": row.inchi,
+        },
+        "supplier": {
+            "id": row.supplier_id,
+            "supplierName": row.supplierName,
+        },
+        "location": (
+            {
+                "id": row.location_id,
+                "locationName": row.locationName,
+            }
+            if row.locationName is not None
+            else None
+        ),
+    }
+
+
+async def get_orders_list_async(
+    db: AsyncSession, user_id: int, since: datetime | None = None
+):
+    ## since: only orders that changed from then on
+    statement = _with_order_joins(select(*ORDER_COLUMNS)).where(
+        models.Order.user_id == user_id
+    )
+    if since is not None:
+        statement = statement.where(models.Order.updatedAt >= since)
+    rows = (await db.execute(statement)).all()
+    ordersList = [_order_from_row(row) for row in rows]
     return ordersList
 
 
-def get_orders_list_by_query(db: Session, query_string: str, query_type: str):
+def order_filter_conditions(filters: OrderFilters):
+    conditions = []
+    if filters.status is not None:
+        conditions.append(models.Order.status == filters.status.value)
+    if filters.dateFrom is not None:
+        conditions.append(models.Order.orderDate >= filters.dateFrom)
+    if filters.dateTo is not None:
+        conditions.append(models.Order.orderDate <= filters.dateTo)
+    if filters.user_id is not None:
+        conditions.append(models.Order.user_id == filters.user_id)
+    if filters.supplier_id is not None:
+        conditions.append(models.Order.supplier_id == filters.supplier_id)
+    if filters.isConsumed is not None:
+        conditions.append(models.Order.isConsumed == filters.isConsumed)
+    return conditions
+
+
+def get_orders_page(
+    db: Session, filters: OrderFilters, limit: int, after: str | None = None
+):
+    query = _orders_projection(db).filter(*order_filter_conditions(filters))
+    ordersPage = paginate(query, models.Order.id, limit=limit, after=after)
+    ordersPage["items"] = [_order_from_row(row) for row in ordersPage["items"]]
+    return ordersPage
+
+
+## only the columns of QueryOrder
+QUERY_ORDER_COLUMNS = (
+    models.Order.id,
+    models.Order.amount,
+    models.Order.amountUnit,
+    models.Order.isConsumed,
+    models.Order.status,
+    models.Order.supplierPN,
+    models.Order.orderDate,
+    models.Chemical.CAS,
+    models.Chemical.chemicalName,
+    models.User.full_name,
+    models.Supplier.supplierName,
+)
+
+
+def _filter_orders_by_query(query, dialect: str, query_string: str, query_type: str):
+    ## works on both a Query and a select(),
+    ## None for an unknown query type or a connectivity query with nothing in it
+    query = (
+        query.join(models.Chemical, models.Order.chemical_id == models.Chemical.id)
+        .join(models.User, models.Order.user_id == models.User.id)
+        .join(models.Supplier, models.Order.supplier_id == models.Supplier.id)
+    )
+
+    ## a search with no words in it matches every order, as the LIKE search did
+    if query_type == "string" and not query_string.split():
+        return query
+
     if query_type == "string":
-        ordersList = (
-            db.query(models.Order, models.Chemical, models.User, models.Supplier)
-            .join(models.Chemical, models.Order.chemical_id == models.Chemical.id)
-            .join(models.User, models.Order.user_id == models.User.id)
-            .join(models.Supplier, models.Order.supplier_id == models.Supplier.id)
-            .filter(
+        chemical_hits = search_hits(dialect, "chemical", query_string)
+        user_hits = search_hits(dialect, "user", query_string)
+
+        if chemical_hits is None or user_hits is None:
+            query = query.filter(
                 or_(
                     models.Chemical.chemicalName.ilike(f"%{query_string}%"),
                     models.User.full_name.ilike(f"%{query_string}%"),
                     models.Chemical.CAS.ilike(f"%{query_string}%"),
                 )
             )
-            .options(
-                selectinload(models.Order.user),
-                selectinload(models.Order.chemical),
-                selectinload(models.Order.supplier),
-                selectinload(models.Order.location),
+        else:
+            ## best matches first, on either the chemical or the user
+            query = (
+                query.outerjoin(
+                    chemical_hits, chemical_hits.c.id == models.Order.chemical_id
+                )
+                .outerjoin(user_hits, user_hits.c.id == models.Order.user_id)
+                .filter(
+                    or_(
+                        models.Order.chemical_id.in_(select(chemical_hits.c.id)),
+                        models.Order.user_id.in_(select(user_hits.c.id)),
+                    )
+                )
+                .order_by(
+                    func.coalesce(chemical_hits.c.rank, 0)
+                    + func.coalesce(user_hits.c.rank, 0),
+                    models.Order.id.desc(),
+                )
             )
-            .all()
-        )
 
-    if query_type == "structure":
-        ordersList = (
-            db.query(models.Order, models.Chemical, models.User, models.Supplier)
-            .join(models.Chemical, models.Order.chemical_id == models.Chemical.id)
-            .join(models.User, models.Order.user_id == models.User.id)
-            .join(models.Supplier, models.Order.supplier_id == models.Supplier.id)
-            .filter(models.Chemical.inchi == query_string)
-            .options(
-                selectinload(models.Order.user),
-                selectinload(models.Order.chemical),
-                selectinload(models.Order.supplier),
-                selectinload(models.Order.location),
+    elif query_type == "structure":
+        structureKey = structure_key(query_string)
+        if structureKey:
+            query = query.filter(models.Chemical.structureKey == structureKey)
+        else:
+            query = query.filter(models.Chemical.inchi == query_string)
+
+    ## same skeleton: stereoisomers, other protonation states and salts of the structure
+    elif query_type == "connectivity":
+        skeleton = skeleton_of(query_string)
+        if not skeleton:
+            return None
+        query = query.filter(
+            models.Chemical.id.in_(
+                select(models.ChemicalSkeleton.chemical_id).where(
+                    models.ChemicalSkeleton.skeleton == skeleton
+                )
             )
-            .all()
         )
 
-    ## ordersList is a list of tuples
-    # [ ( <models.Order object>, <models.Chemical object> ), ... ]
-    # for order, chemical in ordersList:
-    # each iteration, the models.Order object gets mapped to order,
-    # and the models.Chemical object gets mapped to chemical
-
-    # Manually combining the data into a list of dictionaries
-    formatted_orders_list = []
-
-    for order, chemical, user, supplier in ordersList:
-        formatted_order = {
-            "id": order.id,
-            "amount": order.amount,
-            "amountUnit": order.amountUnit,
-            "isConsumed": order.isConsumed,
-            "status": order.status,
-            "supplierPN": order.supplierPN,
-            "orderDate": order.orderDate,
-            "CAS": chemical.CAS,
-            "chemicalName": chemical.chemicalName,
-            "full_name": user.full_name,
-            "supplierName": supplier.supplierName,
-        }
-
-        formatted_orders_list.append(formatted_order)
-    return formatted_orders_list
-
-
-def add_new_order(db: Session, user_id: int, order: OrderIn):
-    db_order = models.Order(
-        user_id=user_id,
-        chemical_id=order.chemical_id,
-        supplier_id=order.supplier_id,
-        amount=order.amount,
-        amountUnit=order.amountUnit,
-        supplierPN=order.supplierPN,
+    else:
+        return None
+
+    return query
+
+
+async def get_orders_list_by_query_async(
+    db: AsyncSession, query_string: str, query_type: str
+):
+    statement = _filter_orders_by_query(
+        select(*QUERY_ORDER_COLUMNS),
+        db.get_bind().dialect.name,
+        query_string=query_string,
+        query_type=query_type,
+    )
+    if statement is None:
+        return []
+
+    ordersList = [row._asdict() for row in (await db.execute(statement)).all()]
+    return ordersList
+
+
+## orders are sent with their chemical, supplier and user, so a change to one of those
+## has to count as a change to its orders for /inventorysync/
+def touch_orders(db: Session, *conditions):
+    db.execute(
+        update(models.Order).where(*conditions).values(updatedAt=datetime.utcnow())
     )
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    return db_order
 
 
 def patch_order_status(db: Session, id: int, status: str):
-    patch_order = db.query(models.Order).filter(models.Order.id == id).first()
+    lock_for_write(db)
+    patch_order = (
+        db.query(models.Order).filter(models.Order.id == id).with_for_update().first()
+    )
 
     if not patch_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    changes = StockChanges()
+    count_stock(changes, stock_fields(patch_order), -1)
     patch_order.status = status
+    count_stock(changes, stock_fields(patch_order))
+    apply_stock_changes(db, changes)
     db.commit()
 
 
 def patch_order_details(db: Session, order: Order):
-    patch_order = db.query(models.Order).filter(models.Order.id == order.id).first()
+    lock_for_write(db)
+    patch_order = (
+        db.query(models.Order)
+        .filter(models.Order.id == order.id)
+        .with_for_update()
+        .first()
+    )
 
     if not patch_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    changes = StockChanges()
+    count_stock(changes, stock_fields(patch_order), -1)
     patch_order.amount = order.amount
     patch_order.amountUnit = order.amountUnit
     patch_order.isConsumed = order.isConsumed
     patch_order.supplierPN = order.supplierPN
+    count_stock(changes, stock_fields(patch_order))
+    apply_stock_changes(db, changes)
     db.commit()
 
 
 def remove_order(db: Session, id: int):
-    rm_order = db.query(models.Order).filter(models.Order.id == id).first()
+    lock_for_write(db)
+    rm_order = (
+        db.query(models.Order).filter(models.Order.id == id).with_for_update().first()
+    )
 
     if not rm_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
+    changes = StockChanges()
+    count_stock(changes, stock_fields(rm_order), -1)
+    apply_stock_changes(db, changes)
     db.delete(rm_order)
     db.commit()
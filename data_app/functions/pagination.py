@@ -0,0 +1,38 @@
+import base64
+import json
+
+from fastapi import HTTPException, status
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+## cursors are opaque to the client: the id of the last row sent, base64 encoded
+def encode_cursor(id: int):
+    return base64.urlsafe_b64encode(json.dumps({"id": id}).encode()).decode()
+
+
+def decode_cursor(after: str):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(after.encode()))["id"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+
+
+def paginate(query, id_column, limit: int, after: str | None):
+    ## keyset pagination: rows after the cursor in id order, one extra to see if there is a next page
+    if after:
+        query = query.filter(id_column > decode_cursor(after))
+
+    rows = query.order_by(id_column).limit(limit + 1).all()
+
+    nextCursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        nextCursor = encode_cursor(rows[-1].id)
+
+    data = {"items": rows, "nextCursor": nextCursor}
+    return data
@@ -0,0 +1,88 @@
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import native_insert
+from ..schemas import ChemicalIn, OrderIn
+from .inventorysummary import (
+    StockChanges,
+    apply_stock_changes,
+    count_stock,
+    stock_fields,
+)
+from .properties import property_values
+from .responsecache import invalidate_responses
+from .structure import structure_key, structure_skeletons
+
+## /order/ as one transaction with a single commit. The chemical is inserted with
+## INSERT ... ON CONFLICT DO NOTHING RETURNING id, and looked up by CAS number when nothing
+## was inserted, so two orders for the same new chemical can't both insert it (or fail on
+## the unique CAS): the second one finds the first one's row.
+
+
+def _insert_chemical(db: Session, values: dict):
+    ## the new id, or None if the CAS number is already taken
+    statement = (
+        native_insert(models.Chemical)
+        .values(values)
+        .on_conflict_do_nothing()
+        .returning(models.Chemical.id)
+    )
+    return db.scalar(statement)
+
+
+def _chemical_id(db: Session, CAS: str):
+    return db.scalar(select(models.Chemical.id).where(models.Chemical.CAS == CAS))
+
+
+## (chemical id, whether it was inserted)
+def upsert_chemical(db: Session, chemical: ChemicalIn):
+    values = {
+        "CAS": chemical.CAS,
+        "chemicalName": chemical.chemicalName,
+        "MW": chemical.MW,
+        "MP": chemical.MP,
+        "BP": chemical.BP,
+        "density": chemical.density,
+        **property_values(chemical.MW, chemical.MP, chemical.BP, chemical.density),
+        "smile": chemical.smile,
+        "inchi": chemical.inchi,
+        "structureKey": structure_key(chemical.inchi),
+    }
+
+    id = _insert_chemical(db, values)
+    if id is None:
+        return _chemical_id(db, chemical.CAS), False
+
+    skeleton_rows = [
+        {"chemical_id": id, "skeleton": skeleton}
+        for skeleton in structure_skeletons(chemical.inchi)
+    ]
+    if skeleton_rows:
+        db.execute(insert(models.ChemicalSkeleton), skeleton_rows)
+    return id, True
+
+
+def place_order(db: Session, user_id: int, chemical: ChemicalIn, order: OrderIn):
+    chemical_id, created = upsert_chemical(db, chemical)
+
+    db_order = models.Order(
+        user_id=user_id,
+        chemical_id=chemical_id,
+        supplier_id=order.supplier_id,
+        amount=order.amount,
+        amountUnit=order.amountUnit,
+        supplierPN=order.supplierPN,
+    )
+    db.add(db_order)
+    db.flush()
+
+    ## a new order is "submitted", so not in stock yet
+    changes = StockChanges()
+    count_stock(changes, stock_fields(db_order))
+    apply_stock_changes(db, changes)
+
+    if created:
+        invalidate_responses(db, "chemicals")
+    db.commit()
+    return db_order
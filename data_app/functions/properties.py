@@ -0,0 +1,124 @@
+import re
+
+## Numbers for the free-text physical properties of a chemical, in one unit each, so they
+## can be filtered and sorted on in the database:
+##   MWValue       g/mol     "101.19"
+##   MPValue       °C        "-114.7 °C", "113-115 °C", "186 °C (decomp)"
+##   BPValue       °C        "89.3 °C" (only at atmospheric pressure, see below)
+##   densityValue  g/cm³     "0.7255 g/cm³ @ Temp: 25 °C"
+## A range gives its middle. Conditions after "@" are left out, except for boiling points
+## measured at a reduced pressure ("97-98 °C @ Press: 3 Torr", "97 °C @ 3 mmHg",
+## "110-112 °C (15 mmHg)"), which would be far too low to compare with the others, so they
+## get no value. Anything else that can't be read (an unknown unit, no number) gets no
+## value either.
+
+NUMBER = r"[-+]?\d+(?:\.\d+)?"
+VALUE = re.compile(
+    rf"^\s*(?P<low>{NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{NUMBER}))?\s*(?P<unit>[^\s(@,;]*)"
+)
+
+## unit -> function to the stored unit
+MW_UNITS = {"": 1.0, "g/mol": 1.0, "Da": 1.0}
+TEMPERATURE_UNITS = {
+    "": lambda value: value,
+    "°C": lambda value: value,
+    "℃": lambda value: value,
+    "C": lambda value: value,
+    "°F": lambda value: (value - 32) * 5 / 9,
+    "F": lambda value: (value - 32) * 5 / 9,
+    "K": lambda value: value - 273.15,
+}
+DENSITY_UNITS = {
+    "": 1.0,
+    "g/cm³": 1.0,
+    "g/cm3": 1.0,
+    "g/cc": 1.0,
+    "g/mL": 1.0,
+    "g/ml": 1.0,
+    "kg/L": 1.0,
+    "kg/m³": 0.001,
+    "kg/m3": 0.001,
+    "g/L": 0.001,
+}
+## in Torr, within 5% of 760 Torr counts as atmospheric
+PRESSURE_UNITS = {
+    "Torr": 1.0,
+    "torr": 1.0,
+    "mmHg": 1.0,
+    "atm": 760.0,
+    "bar": 750.06,
+    "mbar": 0.75006,
+    "hPa": 0.75006,
+    "kPa": 7.5006,
+    "Pa": 0.0075006,
+    "psi": 51.715,
+    "mm": 1.0,  # "110 °C/15 mm", short for mmHg
+}
+ATMOSPHERIC_PRESSURE = (722.0, 798.0)
+
+## "Press: 3 Torr", whatever the unit (an unknown one counts as reduced)
+PRESSURE = re.compile(rf"Press:\s*(?P<value>{NUMBER})\s*(?P<unit>[A-Za-z]*)")
+## any other number with a pressure unit: "@ 3 mmHg", "(15 mmHg)", "/15 mm"
+PRESSURE_UNIT = "|".join(
+    re.escape(unit) for unit in sorted(PRESSURE_UNITS, key=len, reverse=True)
+)
+PRESSURE_VALUE = re.compile(
+    rf"(?P<value>{NUMBER})\s*(?P<unit>{PRESSURE_UNIT})(?![A-Za-z])"
+)
+
+
+def _value(text: str | None):
+    ## (value, unit) from the start of text, the middle of a range
+    if not text:
+        return None
+    text = text.split("@")[0].replace("−", "-").replace("° ", "°")
+    match = VALUE.match(text)
+    if not match:
+        return None
+    low = float(match["low"])
+    high = float(match["high"]) if match["high"] is not None else low
+    return (low + high) / 2, match["unit"]
+
+
+def parse_molecular_weight(MW: str | None):
+    value = _value(MW)
+    if value is None or value[1] not in MW_UNITS:
+        return None
+    return value[0] * MW_UNITS[value[1]]
+
+
+def parse_temperature(temperature: str | None):
+    value = _value(temperature)
+    if value is None or value[1] not in TEMPERATURE_UNITS:
+        return None
+    return TEMPERATURE_UNITS[value[1]](value[0])
+
+
+def parse_boiling_point(BP: str | None):
+    if BP:
+        pressure = PRESSURE.search(BP) or PRESSURE_VALUE.search(BP)
+        if pressure:
+            torr = float(pressure["value"]) * PRESSURE_UNITS.get(pressure["unit"], 0.0)
+            if not ATMOSPHERIC_PRESSURE[0] <= torr <= ATMOSPHERIC_PRESSURE[1]:
+                return None
+    return parse_temperature(BP)
+
+
+def parse_density(density: str | None):
+    value = _value(density)
+    if value is None or value[1] not in DENSITY_UNITS:
+        return None
+    return value[0] * DENSITY_UNITS[value[1]]
+
+
+## the numeric columns of a chemical, from its text ones
+def property_values(
+    MW: str | None, MP: str | None, BP: str | None, density: str | None
+):
+    values = {
+        "MWValue": parse_molecular_weight(MW),
+        "MPValue": parse_temperature(MP),
+        "BPValue": parse_boiling_point(BP),
+        "densityValue": parse_density(density),
+    }
+    return values
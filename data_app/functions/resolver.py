@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import config, models
+from ..schemas import ChemicalIn
+from .writequeue import run_write
+
+logger = logging.getLogger(__name__)
+
+## Details of chemicals that aren't in the database yet, looked up by CAS number or name
+## through a ChemicalResolver rather than by each client from an outside service.
+## Every answer, "not found" too, is kept in chemical_lookup_cache and shared by all users
+## until it is CHEMICAL_LOOKUP_TTL (or CHEMICAL_LOOKUP_NEGATIVE_TTL) old.
+## A resolver for an online service implements resolve() and is added to make_resolver();
+## an error it raises counts as "not found" without being cached, so it is asked again.
+
+
+class ChemicalResolver(ABC):
+    @abstractmethod
+    def resolve(self, queryType: str, query: str) -> ChemicalIn | None:
+        pass
+
+
+class FileResolver(ChemicalResolver):
+    ## a JSON list of chemicals in the ChemicalIn shape, read on first use,
+    ## names are matched whatever their case
+    def __init__(self, path: str):
+        self.path = path
+        self.chemicals = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        with self.lock:
+            if self.chemicals is None:
+                with open(self.path, encoding="utf-8") as file:
+                    chemicals = [
+                        ChemicalIn.model_validate(item) for item in json.load(file)
+                    ]
+                self.chemicals = {
+                    "CAS": {chemical.CAS: chemical for chemical in chemicals},
+                    "chemicalName": {
+                        chemical.chemicalName.lower(): chemical
+                        for chemical in chemicals
+                        if chemical.chemicalName
+                    },
+                }
+            return self.chemicals
+
+    def resolve(self, queryType: str, query: str):
+        if queryType == "chemicalName":
+            query = query.lower()
+        return self._load()[queryType].get(query)
+
+
+def make_resolver(name: str):
+    if name == "file":
+        if os.path.exists(config.CHEMICAL_RESOLVER_FILE):
+            return FileResolver(config.CHEMICAL_RESOLVER_FILE)
+        logger.warning(
+            "chemical resolver file not found, chemicals aren't looked up",
+            extra={"path": config.CHEMICAL_RESOLVER_FILE},
+        )
+    return None
+
+
+resolver = make_resolver(config.CHEMICAL_RESOLVER)
+
+
+def _is_fresh(lookup: models.ChemicalLookup, now: datetime):
+    ttl = config.CHEMICAL_LOOKUP_TTL
+    if not lookup.found:
+        ttl = config.CHEMICAL_LOOKUP_NEGATIVE_TTL
+    return lookup.fetchedAt > now - timedelta(seconds=ttl)
+
+
+def lookup_chemical(db: Session, queryType: str, query: str):
+    if resolver is None or not query:
+        return None
+
+    now = datetime.utcnow()
+    lookup = (
+        db.query(models.ChemicalLookup)
+        .filter(
+            models.ChemicalLookup.queryType == queryType,
+            models.ChemicalLookup.query == query,
+        )
+        .first()
+    )
+    if lookup and _is_fresh(lookup, now):
+        if not lookup.found:
+            return None
+        return ChemicalIn.model_validate_json(lookup.data)
+
+    try:
+        chemical = resolver.resolve(queryType, query)
+    except Exception:
+        return None
+
+    run_write(
+        db, lambda session: _store_lookup(session, queryType, query, chemical, now)
+    )
+    return chemical
+
+
+def _store_lookup(
+    db: Session, queryType: str, query: str, chemical: ChemicalIn | None, now: datetime
+):
+    lookup = (
+        db.query(models.ChemicalLookup)
+        .filter(
+            models.ChemicalLookup.queryType == queryType,
+            models.ChemicalLookup.query == query,
+        )
+        .first()
+    )
+    if lookup is None:
+        lookup = models.ChemicalLookup(queryType=queryType, query=query)
+        db.add(lookup)
+    lookup.found = chemical is not None
+    lookup.data = chemical.model_dump_json() if chemical else None
+    lookup.fetchedAt = now
+    try:
+        db.commit()
+    except IntegrityError:
+        ## looked up by another request at the same time, which stored it first
+        db.rollback()
+
+
+## the fields of a chemical that weren't given, filled in by CAS number
+## if it isn't in the database yet
+def fill_chemical(db: Session, chemical: ChemicalIn):
+    missing = [
+        field
+        for field in ChemicalIn.model_fields
+        if getattr(chemical, field) in (None, "")
+    ]
+    if not missing or resolver is None:
+        return chemical
+    if db.query(models.Chemical.id).filter(models.Chemical.CAS == chemical.CAS).first():
+        return chemical
+
+    resolved = lookup_chemical(db, "CAS", chemical.CAS)
+    if resolved is None:
+        return chemical
+
+    filled = chemical.model_copy(
+        update={field: getattr(resolved, field) for field in missing}
+    )
+    return filled
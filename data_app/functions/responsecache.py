@@ -0,0 +1,172 @@
+import hashlib
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+
+from .. import config
+from ..database import call_after_commit
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+## Reference data (suppliers, chemicals) is read on every page load and rarely written,
+## so list responses are kept as ready-made JSON bytes.
+## Each namespace has a version number in its keys: a write bumps the version rather than
+## deleting entries, and the entries of older versions fall out of the cache on their own.
+
+## stored entries are the ETag followed by the body
+ETAG_LENGTH = 32
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: int):
+        pass
+
+    @abstractmethod
+    def version(self, namespace: str) -> int:
+        pass
+
+    @abstractmethod
+    def bump(self, namespace: str):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    ## least recently used entries go first once there are more than size
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    ## versions are kept apart from the entries, so they are never evicted
+    def version(self, namespace: str):
+        with self.lock:
+            return self.versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+
+class RedisCache(CacheBackend):
+    ## shared by all workers, errors are treated as misses so the database is used instead
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError(
+                "RESPONSE_CACHE_BACKEND=redis needs the redis package installed"
+            )
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        try:
+            return self.client.get(key)
+        except redis.RedisError:
+            return None
+
+    def set(self, key: str, value: bytes, ttl: int):
+        try:
+            self.client.set(key, value, ex=ttl)
+        except redis.RedisError:
+            pass
+
+    def version(self, namespace: str):
+        try:
+            return int(self.client.get(f"{namespace}:version") or 0)
+        except redis.RedisError:
+            return 0
+
+    def bump(self, namespace: str):
+        try:
+            self.client.incr(f"{namespace}:version")
+        except redis.RedisError:
+            pass
+
+
+def make_backend(name: str):
+    if name == "memory":
+        return MemoryCache(config.RESPONSE_CACHE_SIZE)
+    if name == "redis":
+        return RedisCache(config.RESPONSE_CACHE_URL)
+    return None
+
+
+backend = make_backend(config.RESPONSE_CACHE_BACKEND)
+
+
+## called by the write functions, the version is bumped once the write is committed
+def invalidate_responses(db: Session, namespace: str):
+    call_after_commit(db, lambda: bump_namespace(namespace))
+
+
+def bump_namespace(namespace: str):
+    if backend is not None:
+        backend.bump(namespace)
+
+
+def _matches(if_none_match: str | None, etag: str):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    ## weak comparison, as for GET requests
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags
+
+
+def cached_response(request: Request, namespace: str, key: str, build, adapter):
+    ## build() gets the data from the database, adapter (a TypeAdapter of the
+    ## response model) validates it and turns it into JSON
+    version = backend.version(namespace) if backend is not None else 0
+    cache_key = f"{namespace}:v{version}:{key}"
+
+    entry = backend.get(cache_key) if backend is not None else None
+    if entry is None:
+        ## the version was read before the data, so data older than a write
+        ## can only be stored under the version from before that write
+        body = adapter.dump_json(adapter.validate_python(build(), from_attributes=True))
+        entry = hashlib.blake2b(body, digest_size=ETAG_LENGTH // 2).hexdigest().encode()
+        entry += body
+        if backend is not None:
+            backend.set(cache_key, entry, config.RESPONSE_CACHE_TTL)
+
+    etag = '"' + entry[:ETAG_LENGTH].decode() + '"'
+    ## the lists need a login, so only the client keeps a copy and checks it every time
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(
+        content=entry[ETAG_LENGTH:], media_type="application/json", headers=headers
+    )
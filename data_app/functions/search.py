@@ -0,0 +1,124 @@
+from sqlalchemy import Float, Integer, inspect, text
+
+## Full-text search over chemical names/CAS numbers and user names.
+## On SQLite these are FTS5 tables kept in sync with chemicals and profiles by triggers,
+## so every write path (including bulk inserts) updates the index.
+## On Postgres the same searches are served by GIN indexes on tsvector expressions,
+## which the database keeps up to date by itself.
+
+SQLITE_SEARCH_TABLES = {
+    "chemicals_fts": [
+        """CREATE VIRTUAL TABLE chemicals_fts USING fts5(
+            chemicalName, CAS, content='chemicals', content_rowid='id'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS chemicals_fts_insert AFTER INSERT ON chemicals BEGIN
+            INSERT INTO chemicals_fts(rowid, chemicalName, CAS)
+            VALUES (new.id, new.chemicalName, new.CAS);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS chemicals_fts_delete AFTER DELETE ON chemicals BEGIN
+            INSERT INTO chemicals_fts(chemicals_fts, rowid, chemicalName, CAS)
+            VALUES ('delete', old.id, old.chemicalName, old.CAS);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS chemicals_fts_update AFTER UPDATE ON chemicals BEGIN
+            INSERT INTO chemicals_fts(chemicals_fts, rowid, chemicalName, CAS)
+            VALUES ('delete', old.id, old.chemicalName, old.CAS);
+            INSERT INTO chemicals_fts(rowid, chemicalName, CAS)
+            VALUES (new.id, new.chemicalName, new.CAS);
+        END""",
+    ],
+    "profiles_fts": [
+        """CREATE VIRTUAL TABLE profiles_fts USING fts5(
+            full_name, username, content='profiles', content_rowid='id'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS profiles_fts_insert AFTER INSERT ON profiles BEGIN
+            INSERT INTO profiles_fts(rowid, full_name, username)
+            VALUES (new.id, new.full_name, new.username);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS profiles_fts_delete AFTER DELETE ON profiles BEGIN
+            INSERT INTO profiles_fts(profiles_fts, rowid, full_name, username)
+            VALUES ('delete', old.id, old.full_name, old.username);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS profiles_fts_update AFTER UPDATE ON profiles BEGIN
+            INSERT INTO profiles_fts(profiles_fts, rowid, full_name, username)
+            VALUES ('delete', old.id, old.full_name, old.username);
+            INSERT INTO profiles_fts(rowid, full_name, username)
+            VALUES (new.id, new.full_name, new.username);
+        END""",
+    ],
+}
+
+CHEMICAL_TSVECTOR = """to_tsvector('simple', coalesce("chemicalName", '') || ' ' || coalesce("CAS", ''))"""
+USER_TSVECTOR = """to_tsvector('simple', coalesce(full_name, '') || ' ' || coalesce(username, ''))"""
+
+POSTGRES_SEARCH_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS ix_chemicals_search ON chemicals USING gin ({CHEMICAL_TSVECTOR})",
+    f"CREATE INDEX IF NOT EXISTS ix_profiles_search ON profiles USING gin ({USER_TSVECTOR})",
+]
+
+## every word of the query is matched as a prefix, parsed the same way as the indexed text
+POSTGRES_PREFIX_TSQUERY = """to_tsquery('simple', (
+    SELECT string_agg(quote_literal(lexeme) || ':*', ' & ')
+    FROM unnest(to_tsvector('simple', :q))
+))"""
+
+
+def create_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        existing = inspect(connection).get_table_names()
+        for table, (create_table, *triggers) in SQLITE_SEARCH_TABLES.items():
+            ## triggers are recreated if a migration has rebuilt the content table
+            for trigger in triggers:
+                connection.exec_driver_sql(trigger)
+            if table in existing:
+                continue
+            connection.exec_driver_sql(create_table)
+            ## index the rows that were already there
+            connection.exec_driver_sql(
+                f"INSERT INTO {table}({table}) VALUES ('rebuild')"
+            )
+
+    if dialect == "postgresql":
+        for statement in POSTGRES_SEARCH_INDEXES:
+            connection.exec_driver_sql(statement)
+
+
+## The index is created by an alembic revision (de3a93513e94_search_index.py), and again
+## at startup for a database made by create_all: that is a no-op when it's all there,
+## and puts back triggers that were lost when a migration rebuilt a content table.
+def setup_search_index(engine):
+    with engine.begin() as connection:
+        create_search_index(connection)
+
+
+def _fts5_prefix_query(query_string: str):
+    ## each word is quoted (so user input can't use FTS5 syntax) and matched as a prefix
+    terms = ['"' + term.replace('"', '""') + '"*' for term in query_string.split()]
+    return " ".join(terms)
+
+
+def search_hits(dialect: str, entity: str, query_string: str):
+    ## Subquery of (id, rank) for the chemicals or users matching query_string,
+    ## where a lower rank is a better match. None if the database has no search index.
+    ## query_string needs at least one word: an empty FTS5 MATCH is a syntax error.
+    if dialect == "sqlite":
+        table = {"chemical": "chemicals_fts", "user": "profiles_fts"}[entity]
+        statement = text(
+            f"SELECT rowid AS id, bm25({table}) AS rank FROM {table} WHERE {table} MATCH :q"
+        ).bindparams(q=_fts5_prefix_query(query_string))
+
+    elif dialect == "postgresql":
+        table, vector = {
+            "chemical": ("chemicals", CHEMICAL_TSVECTOR),
+            "user": ("profiles", USER_TSVECTOR),
+        }[entity]
+        statement = text(
+            f"SELECT id, -ts_rank({vector}, query) AS rank "
+            f"FROM {table}, {POSTGRES_PREFIX_TSQUERY} AS query "
+            f"WHERE {vector} @@ query"
+        ).bindparams(q=query_string)
+
+    else:
+        return None
+
+    return statement.columns(id=Integer, rank=Float).subquery(f"{entity}_hits")
@@ -0,0 +1,202 @@
+import itertools
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+
+from sqlalchemy import event
+
+from .. import config
+from .metrics import route_of
+
+## Development mode (PROFILE_SQL): every SQL statement of a request is recorded with its time,
+## and the query plan of the first statement of each shape (EXPLAIN QUERY PLAN on SQLite,
+## EXPLAIN on Postgres). The report of a request flags:
+##   repeated   shapes run PROFILE_SQL_REPEATS times or more, usually a lazy load in a loop (N+1)
+##   slow       statements that took PROFILE_SQL_SLOW_MS or longer
+##   fullScans  plans that read a whole table
+## Each response gets an X-SQL-Profile header with the counts and the report id, and the
+## last PROFILE_SQL_REPORTS reports are kept for /debug/sqlprofile/.
+## The shape of a statement is its text with IN lists collapsed, the parameters are left out.
+
+## the placeholders of SQLite, psycopg2 and asyncpg
+PLACEHOLDER = r"(?:\?|%\(\w+\)s|\$\d+)"
+IN_LIST = re.compile(rf"\({PLACEHOLDER}(?:, {PLACEHOLDER})*\)")
+WHITESPACE = re.compile(r"\s+")
+EXPLAINED = ("SELECT", "WITH", "UPDATE", "DELETE")
+FULL_SCAN = re.compile(r"^SCAN (?!.*USING (?:COVERING )?INDEX)|Seq Scan")
+
+report_ids = itertools.count(1)
+reports = deque(maxlen=config.PROFILE_SQL_REPORTS)
+reports_lock = threading.Lock()
+
+
+def statement_shape(statement: str):
+    return WHITESPACE.sub(" ", IN_LIST.sub("(...)", statement)).strip()
+
+
+## the statements of the request being handled
+class Profile:
+    def __init__(self):
+        self.statements = []
+        self.plans = {}
+
+    def record(self, statement: str, milliseconds: float, executemany: bool):
+        self.statements.append(
+            {
+                "shape": statement_shape(statement),
+                "ms": round(milliseconds, 3),
+                "executemany": executemany,
+            }
+        )
+
+    def report(self):
+        shapes = Counter(statement["shape"] for statement in self.statements)
+        report = {
+            "statementCount": len(self.statements),
+            "dbMs": round(sum(statement["ms"] for statement in self.statements), 3),
+            "statements": self.statements,
+            "plans": self.plans,
+            "repeated": [
+                {"shape": shape, "count": count}
+                for shape, count in shapes.most_common()
+                if count >= config.PROFILE_SQL_REPEATS
+            ],
+            "slow": [
+                statement
+                for statement in self.statements
+                if statement["ms"] >= config.PROFILE_SQL_SLOW_MS
+            ],
+            "fullScans": [
+                shape
+                for shape, plan in self.plans.items()
+                if any(FULL_SCAN.search(line) for line in plan)
+            ],
+        }
+        return report
+
+
+current_profile: ContextVar[Profile | None] = ContextVar(
+    "current_profile", default=None
+)
+
+
+def _query_plan(conn, statement: str, parameters):
+    ## on a cursor of its own, so the statement's results are left alone
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f"no plan: {error}"]
+    finally:
+        cursor.close()
+
+
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+    context.profile_start = time.perf_counter()
+
+
+def end_statement(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is None:
+        return
+    milliseconds = (time.perf_counter() - context.profile_start) * 1000
+    profile.record(statement, milliseconds, executemany)
+
+    shape = profile.statements[-1]["shape"]
+    if shape not in profile.plans and statement.lstrip().upper().startswith(EXPLAINED):
+        if executemany:
+            parameters = parameters[0]
+        profile.plans[shape] = _query_plan(conn, statement, parameters)
+
+
+def profile_engine(engine):
+    ## engine: a sync Engine, or the sync_engine of an AsyncEngine
+    event.listen(engine, "before_cursor_execute", start_statement)
+    event.listen(engine, "after_cursor_execute", end_statement)
+
+
+def _summary(report: dict):
+    return {
+        key: report[key]
+        for key in (
+            "id",
+            "method",
+            "path",
+            "route",
+            "status",
+            "startedAt",
+            "durationMs",
+            "statementCount",
+            "dbMs",
+        )
+    } | {
+        "repeated": len(report["repeated"]),
+        "slow": len(report["slow"]),
+        "fullScans": len(report["fullScans"]),
+    }
+
+
+class SQLProfileMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile()
+        id = next(report_ids)
+        status_code = 500
+
+        async def send_with_header(message):
+            ## the counts so far: a streamed body may run more statements after this
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                report = profile.report()
+                header = (
+                    f"id={id}; statements={report['statementCount']}; "
+                    f"db_ms={report['dbMs']}; repeated={len(report['repeated'])}; "
+                    f"slow={len(report['slow'])}; full_scans={len(report['fullScans'])}"
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-sql-profile", header.encode()),
+                ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        startedAt = datetime.utcnow()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            current_profile.reset(token)
+            report = {
+                "id": id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_of(scope),
+                "status": status_code,
+                "startedAt": startedAt.isoformat(),
+                "durationMs": round((time.perf_counter() - start) * 1000, 3),
+                **profile.report(),
+            }
+            with reports_lock:
+                reports.append(report)
+
+
+## /debug/sqlprofile/: the summaries of the kept reports, newest first, or one whole report
+def get_sql_profiles(id: int | None = None):
+    with reports_lock:
+        kept = list(reports)
+    if id is not None:
+        return next((report for report in kept if report["id"] == id), None)
+    summaries = [_summary(report) for report in reversed(kept)]
+    return summaries
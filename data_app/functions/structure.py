@@ -0,0 +1,119 @@
+import hashlib
+import re
+
+## Fixed-width structure keys computed from InChI strings, in the InChIKey layout:
+##   14 letters  - hash of the main layer (formula, connectivity and hydrogens)
+##   8 letters   - hash of the remaining layers (charge, stereo, isotopes, ...)
+##   2 letters   - standard/non-standard flag and version
+##   1 letter    - protonation
+## The hashes are not the official InChIKey ones, so keys are only comparable with each other.
+## Structures with the same first block share a skeleton: stereoisomers, isotopologues
+## and protonation states. Each component of a multi-component InChI (salts, solvates)
+## also gets a skeleton, so a parent structure finds its salts.
+
+INCHI_PREFIX = re.compile(r"^InChI=1(S?)/")
+FORMULA_MULTIPLIER = re.compile(r"^\d+")  # "2" in "2C2H3O2"
+LAYER_MULTIPLIER = re.compile(r"^\d+\*")  # "2*" in "2*1-2(3)4"
+
+
+def _letters(text: str, length: int):
+    number = int.from_bytes(hashlib.sha256(text.encode()).digest(), "big")
+    letters = []
+    for _ in range(length):
+        number, remainder = divmod(number, 26)
+        letters.append(chr(ord("A") + remainder))
+    return "".join(letters)
+
+
+def _parse_inchi(inchi: str | None):
+    if not inchi:
+        return None
+    inchi = inchi.strip()
+    match = INCHI_PREFIX.match(inchi)
+    if not match:
+        return None
+
+    parts = inchi[match.end() :].split("/")
+    if not parts[0]:
+        return None
+
+    ## the first c and h layers make up the main layer with the formula,
+    ## later ones belong to fixed-H or reconnected layers
+    main = {"formula": parts[0]}
+    rest = []
+    protonation = 0
+    for part in parts[1:]:
+        if not part:
+            continue
+        if part[0] in "ch" and part[0] not in main:
+            main[part[0]] = part[1:]
+        elif part[0] == "p" and not rest:
+            try:
+                protonation = int(part[1:])
+            except ValueError:
+                rest.append(part)
+        else:
+            rest.append(part)
+
+    standard = match.group(1) == "S"
+    return main, rest, protonation, standard
+
+
+def _main_layer(formula: str, c: str | None, h: str | None):
+    layer = formula
+    if c:
+        layer += "/c" + c
+    if h:
+        layer += "/h" + h
+    return layer
+
+
+def structure_key(inchi: str | None):
+    parsed = _parse_inchi(inchi)
+    if not parsed:
+        return None
+    main, rest, protonation, standard = parsed
+
+    first = _letters(_main_layer(main["formula"], main.get("c"), main.get("h")), 14)
+    second = _letters("/".join(rest), 8)
+    flags = ("S" if standard else "N") + "A"
+    protonation = chr(ord("N") + max(-13, min(12, protonation)))
+    return f"{first}-{second}{flags}-{protonation}"
+
+
+def structure_skeletons(inchi: str | None):
+    ## first block of the whole structure and of each of its components
+    parsed = _parse_inchi(inchi)
+    if not parsed:
+        return set()
+    main, _, _, _ = parsed
+
+    skeletons = {
+        _letters(_main_layer(main["formula"], main.get("c"), main.get("h")), 14)
+    }
+
+    formulas = main["formula"].split(".")
+    if len(formulas) > 1:
+        cs = main.get("c", "").split(";")
+        hs = main.get("h", "").split(";")
+        if len(cs) < len(formulas):
+            cs += [""] * (len(formulas) - len(cs))
+        if len(hs) < len(formulas):
+            hs += [""] * (len(formulas) - len(hs))
+        for formula, c, h in zip(formulas, cs, hs):
+            formula = FORMULA_MULTIPLIER.sub("", formula)
+            c = LAYER_MULTIPLIER.sub("", c)
+            h = LAYER_MULTIPLIER.sub("", h)
+            skeletons.add(_letters(_main_layer(formula, c, h), 14))
+
+    return skeletons
+
+
+def skeleton_of(query: str | None):
+    ## accepts an InChI, a structure key or just its first block, None for an empty query
+    if not query or not query.strip():
+        return None
+    if INCHI_PREFIX.match(query.strip()):
+        key = structure_key(query)
+        return key[:14] if key else None
+    return query.strip().upper()[:14]
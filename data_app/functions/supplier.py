@@ -4,6 +4,9 @@ from sqlalchemy.orm import Session, selectinload
 
 from .. import models
 from ..schemas import SupplierIn, Supplier
+from .inventorysummary import StockChanges, apply_stock_changes, count_stock_in_database
+from .order import touch_orders
+from .responsecache import invalidate_responses
 
 
 def add_new_supplier(db: Session, supplier: SupplierIn):
@@ -11,6 +14,7 @@ def add_new_supplier(db: Session, supplier: SupplierIn):
         supplierName=supplier.supplierName,
     )
     db.add(db_supplier)
+    invalidate_responses(db, "suppliers")
     db.commit()
     db.refresh(db_supplier)
     return db_supplier
@@ -38,6 +42,8 @@ def patch_supplier_details(db: Session, supplier: Supplier):
         raise HTTPException(status_code=404, detail="Supplier not found")
 
     patch_supplier.supplierName = supplier.supplierName
+    touch_orders(db, models.Order.supplier_id == supplier.id)
+    invalidate_responses(db, "suppliers")
     db.commit()
 
 
@@ -47,5 +53,11 @@ def remove_supplier(db: Session, id: int):
     if not rm_supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
 
+    ## its orders are deleted with it
+    changes = StockChanges()
+    count_stock_in_database(db, changes, models.Order.supplier_id == id)
+    apply_stock_changes(db, changes)
+
     db.delete(rm_supplier)
+    invalidate_responses(db, "suppliers")
     db.commit()
@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session, selectinload
 
 from .. import models
 from ..schemas import User
+from .auth import invalidate_cached_user
+from .order import touch_orders
 
 
 def check_duplicate_user(db: Session, username: str):
@@ -30,4 +32,6 @@ def patch_user_details(db: Session, user: User):
         raise HTTPException(status_code=404, detail="User not found")
 
     patch_user.full_name = user.full_name
+    touch_orders(db, models.Order.user_id == user.id)
     db.commit()
+    invalidate_cached_user(user.id)
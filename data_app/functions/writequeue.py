@@ -0,0 +1,123 @@
+import contextvars
+import queue
+import threading
+from concurrent.futures import Future
+
+from sqlalchemy.orm import Session
+
+from .. import config
+from ..database import BACKEND, engine
+
+## SQLite has a single write lock. Instead of every request waiting on it (and failing with
+## "database is locked" once the busy timeout runs out), writes are handed to one thread that
+## runs them one after the other on its own connection, and commits all the writes that were
+## waiting in a single transaction. WAL mode means reads never wait for that thread.
+WRITE_QUEUE_ENABLED = BACKEND == "sqlite" and config.SQLITE_WRITE_QUEUE
+
+write_jobs = queue.SimpleQueue()
+writer = None
+writer_lock = threading.Lock()
+
+
+def submit_write(fn) -> Future:
+    ## fn(session) runs on the writer thread, the future has its return value
+    ## once the batch it ran in has been committed.
+    ## It runs in the caller's context, so its statements count towards the caller's request.
+    future = Future()
+    context = contextvars.copy_context()
+    write_jobs.put((lambda session: context.run(fn, session), future))
+    start_writer()
+    return future
+
+
+def start_writer():
+    global writer
+    with writer_lock:
+        if writer is None or not writer.is_alive():
+            writer = threading.Thread(
+                target=run_writer, name="sqlite-writer", daemon=True
+            )
+            writer.start()
+
+
+def run_writer():
+    while True:
+        batch = [write_jobs.get()]
+        while len(batch) < config.SQLITE_WRITE_BATCH_SIZE:
+            try:
+                batch.append(write_jobs.get_nowait())
+            except queue.Empty:
+                break
+        run_write_batch(batch)
+
+
+def run_write_batch(batch: list):
+    outcomes = []
+    try:
+        with engine.connect() as connection:
+            ## take the write lock up front, so that a writer in another worker process
+            ## makes this wait for the busy timeout rather than fail halfway through,
+            ## with pysqlite's own transaction handling off (see begin_sqlite_transaction)
+            dbapi_connection = connection.connection.dbapi_connection
+            dbapi_connection.isolation_level = None
+            try:
+                connection.execution_options(sqlite_begin_immediate=True)
+                with connection.begin():
+                    for fn, future in batch:
+                        ## the caller has stopped waiting
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        outcomes.append((future, *run_write_job(connection, fn)))
+            finally:
+                ## pysqlite's default, for whoever checks the connection out next
+                dbapi_connection.isolation_level = ""
+
+    except Exception as error:
+        ## nothing in the batch was committed
+        for fn, future in batch:
+            if future.done():
+                continue
+            if future.running() or future.set_running_or_notify_cancel():
+                future.set_exception(error)
+        return
+
+    for future, result, error, callbacks in outcomes:
+        for callback in callbacks:
+            callback()
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+
+def run_write_job(connection, fn):
+    ## Each job gets a session inside a SAVEPOINT of the batch transaction, so its
+    ## db.commit() only releases the savepoint and a failing job is rolled back on its own.
+    ## Objects keep their loaded attributes after the session is closed.
+    ## Its after commit callbacks are run once the batch has been committed.
+    session = Session(
+        bind=connection,
+        join_transaction_mode="create_savepoint",
+        autoflush=False,
+        expire_on_commit=False,
+        info={"outer_transaction": True},
+    )
+    try:
+        result = fn(session)
+        return result, None, session.info.get("after_commit", [])
+    except Exception as error:
+        session.rollback()
+        ## anything the job committed before failing stays in the batch
+        return None, error, session.info.get("after_commit", [])
+    finally:
+        session.close()
+
+
+## Endpoints call these with their own session and a function of a session.
+## Without the write queue (e.g. Postgres) fn just runs on the endpoint's session.
+## With it, fn gets a session of its own that is closed by the time its result is returned,
+## so it should return plain values rather than objects that still need to lazy load.
+def run_write(db: Session, fn):
+    if not WRITE_QUEUE_ENABLED:
+        return fn(db)
+    return submit_write(fn).result()
@@ -1,18 +1,28 @@
-from fastapi import Depends, FastAPI, Query, HTTPException, status
+from fastapi import Depends, FastAPI, Query, HTTPException, Request, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Annotated
-
-from . import models
-from .database import SessionLocal, engine
-
-from .functions.auth import validate_current_user, validate_current_admin
+from typing import Annotated, Literal
+
+from . import config, models
+from .database import SessionLocal, engine, get_db, get_async_db, pool_stats
+
+from .functions.logs import setup_logging
+from .functions.metrics import MetricsMiddleware, render_metrics
+from .functions.sqlprofile import SQLProfileMiddleware, get_sql_profiles
+from .functions.auth import (
+    validate_current_user,
+    validate_current_admin,
+    validate_current_user_async,
+)
 from .functions.user import check_duplicate_user, add_new_user, patch_user_details
 from .functions.chemical import (
-    add_new_chemical,
     patch_chemical_details,
     remove_chemical,
+    search_chemicals,
 )
 from .functions.supplier import (
     check_duplicate_supplier,
@@ -21,15 +31,16 @@ from .functions.supplier import (
     remove_supplier,
 )
 from .functions.order import (
-    get_orders_list,
-    get_orders_list_by_query,
-    add_new_order,
+    get_orders_list_async,
+    get_orders_page,
+    get_orders_list_by_query_async,
     patch_order_status,
     patch_order_details,
     remove_order,
 )
+from .functions.pagination import paginate, DEFAULT_LIMIT, MAX_LIMIT
 from .functions.location import (
-    get_locations_list,
+    get_locations_list_async,
     check_duplicate_location,
     add_new_location,
     remove_location,
@@ -38,39 +49,73 @@ from .functions.inventory2 import (
     patch_inventory_amount_location,
     patch_inventory_status,
 )
+from .functions.search import setup_search_index
+from .functions.inventorysync import get_inventory_changes, prune_tombstones
+from .functions.writequeue import run_write
+from .functions.responsecache import cached_response
+from .functions.fastjson import json_response
+from .functions.export import MEDIA_TYPES, stream_orders, stream_chemicals
+from .functions.analytics import get_analytics
+from .functions.inventorysummary import get_inventory_summary
+from .functions.resolver import fill_chemical, lookup_chemical
+from .functions.placeorder import place_order
+from .functions.batch import (
+    patch_orders_status,
+    patch_inventory_statuses,
+    patch_inventory_amounts_locations,
+    add_new_orders,
+)
+from .functions.csvimport import import_csv_data, ingest_csv_file
+from .functions.importjob import (
+    add_new_import_job,
+    get_import_job,
+    submit_import_job,
+    resume_import_jobs,
+)
 
 from .schemas import (
     User,
     ChemOrderIn,
     Chemical,
+    ChemicalIn,
+    ChemicalFilters,
+    ChemicalProperties,
+    ChemicalSortEnum,
     SupplierIn,
     Supplier,
     Order,
     LocationIn,
     Location,
     Inventory,
+    InventorySync,
     InventoryPatchIn,
     InventoryPatch,
     QueryOrder,
+    OrderFilters,
+    ExportFormatEnum,
+    OrderStatusBatchIn,
+    InventoryStatusBatchIn,
+    InventoryPatchBatchIn,
+    ChemOrderBatchIn,
+    BatchItemResult,
+    Analytics,
+    InventoryStock,
+    PoolStats,
+    Page,
 )
-from .csvschema import CSVGlobal
+from .csvschema import CSVGlobal, CSVImportSummary, CSVUploadReport, ImportJob
 
-from datetime import datetime
+import logging
+
+setup_logging(config.LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 models.Base.metadata.create_all(bind=engine)
+setup_search_index(engine)
 
 app = FastAPI()
 
 
-# Dependencies
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # removing the trailing slash was important
 origins = [
     "http://localhost:5173",
@@ -84,65 +129,197 @@ app.add_middleware(
     allow_headers=["*"],
     allow_credentials=True,
 )
+## added last, so it is the outermost middleware and times the others too
+if config.PROFILE_SQL:
+    app.add_middleware(SQLProfileMiddleware)
+if config.METRICS:
+    app.add_middleware(MetricsMiddleware)
+
+
+## picks up import jobs that were interrupted by a restart, and drops old tombstones
+@app.on_event("startup")
+def startup():
+    resume_import_jobs()
+    with SessionLocal() as db:
+        run_write(db, prune_tombstones)
+
 
 ### GET: LOAD ###
 # Admin #
 
 
-@app.get("/userslist/", response_model=list[User])
+## list endpoints are paginated: pass the nextCursor of a page as "after" to get the next one
+@app.get("/userslist/", response_model=Page[User])
 def get_users(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: str = Query(None),
 ):
-    usersList = db.query(models.User).all()
-    data = usersList
+    usersPage = paginate(
+        db.query(models.User), models.User.id, limit=limit, after=after
+    )
+    data = usersPage
     return data
 
 
-@app.get("/chemicalslist/", response_model=list[Chemical])
+## chemicals and suppliers come from the response cache, with an ETag:
+## sending it back as If-None-Match gets a 304 while the list is unchanged
+chemicals_page_adapter = TypeAdapter(Page[Chemical])
+suppliers_page_adapter = TypeAdapter(Page[Supplier])
+
+## for the FAST_JSON path of /orderslist/ and /inventory/
+orders_page_adapter = TypeAdapter(Page[Order])
+inventory_adapter = TypeAdapter(Inventory)
+
+
+@app.get("/chemicalslist/", response_model=Page[Chemical])
 def get_chemicals(
+    request: Request,
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: str = Query(None),
+):
+    chemicalsPage = cached_response(
+        request,
+        "chemicals",
+        key=f"{limit}:{after}",
+        build=lambda: paginate(
+            db.query(models.Chemical), models.Chemical.id, limit=limit, after=after
+        ),
+        adapter=chemicals_page_adapter,
+    )
+    data = chemicalsPage
+    return data
+
+
+@app.get("/poolstats/", response_model=PoolStats)
+def get_pool_stats(
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+):
+    data = pool_stats()
+    return data
+
+
+## for a Prometheus scraper, in its text format, see functions/metrics.py
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    if not config.METRICS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    data = PlainTextResponse(
+        render_metrics(pool_stats()), media_type="text/plain; version=0.0.4"
+    )
+    return data
+
+
+## PROFILE_SQL only: the recent requests, or the statements, plans and flags of one
+@app.get("/debug/sqlprofile/", include_in_schema=False)
+def get_sql_profile(
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    id: int = Query(None),
+):
+    if not config.PROFILE_SQL:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    sqlProfile = get_sql_profiles(id)
+    if sqlProfile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    data = sqlProfile
+    return data
+
+
+## totals over all orders, worked out by the database
+@app.get("/analytics/", response_model=Analytics)
+def get_analytics_totals(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
 ):
-    chemicalsList = db.query(models.Chemical).all()
-    data = chemicalsList
+    analytics = get_analytics(db)
+    data = analytics
     return data
 
 
-@app.get("/orderslist/", response_model=list[Order])
+@app.get("/orderslist/", response_model=Page[Order])
 def get_orders(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
+    filters: OrderFilters = Depends(),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: str = Query(None),
 ):
-    ordersList = get_orders_list(db, user_id="all")
-    data = ordersList
+    ordersPage = get_orders_page(db, filters=filters, limit=limit, after=after)
+    ## the items are built by _order_from_row in the shape of Order
+    data = json_response(ordersPage, orders_page_adapter, trusted=True)
     return data
 
 
 # User #
-@app.get("/supplierslist/", response_model=list[Supplier])
+@app.get("/supplierslist/", response_model=Page[Supplier])
 def get_suppliers(
+    request: Request,
     current_user: Annotated[models.User, Depends(validate_current_user)],
     db: Session = Depends(get_db),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: str = Query(None),
 ):
-    suppliersList = db.query(models.Supplier).all()
-    data = suppliersList
+    suppliersPage = cached_response(
+        request,
+        "suppliers",
+        key=f"{limit}:{after}",
+        build=lambda: paginate(
+            db.query(models.Supplier), models.Supplier.id, limit=limit, after=after
+        ),
+        adapter=suppliers_page_adapter,
+    )
+    data = suppliersPage
     return data
 
 
 @app.get("/inventory/", response_model=Inventory)
 async def get_inventory_lists(
-    current_user: Annotated[models.User, Depends(validate_current_user)],
-    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(validate_current_user_async)],
+    db: AsyncSession = Depends(get_async_db),
 ):
-    current_datetime = datetime.now()
-    # current_date = current_datetime.date()
-    print("Date Accessed: ", current_datetime)
+    logger.debug("inventory", extra={"user_id": current_user.id})
+
+    locationsList = await get_locations_list_async(db=db, user_id=current_user.id)
+    ordersList = await get_orders_list_async(db=db, user_id=current_user.id)
+
+    ## both lists are plain dicts in the shape of Location and Order
+    data = json_response(
+        {"locationsList": locationsList, "ordersList": ordersList},
+        inventory_adapter,
+        trusted=True,
+    )
+    return data
 
-    locationsList = get_locations_list(db=db, user_id=current_user.id)
-    ordersList = get_orders_list(db=db, user_id=current_user.id)
 
-    data = {"locationsList": locationsList, "ordersList": ordersList}
+## Only what changed since the syncToken of an earlier response (or everything without one),
+## plus the ids of deleted orders and locations. Send the new syncToken next time.
+@app.get("/inventorysync/", response_model=InventorySync)
+async def get_inventory_sync(
+    current_user: Annotated[models.User, Depends(validate_current_user_async)],
+    db: AsyncSession = Depends(get_async_db),
+    since: str = Query(None),
+):
+    inventoryChanges = await get_inventory_changes(
+        db=db, user_id=current_user.id, since=since
+    )
+    data = inventoryChanges
+    return data
+
+
+## the user's stock (received, not consumed) per location and chemical,
+## read from the inventory summary rather than added up from their orders
+@app.get("/inventorysummary/", response_model=list[InventoryStock])
+def get_inventory_stock(
+    current_user: Annotated[models.User, Depends(validate_current_user)],
+    db: Session = Depends(get_db),
+):
+    inventorySummary = get_inventory_summary(db=db, user_id=current_user.id)
+    data = inventorySummary
     return data
 
 
@@ -177,15 +354,58 @@ def get_chemical(
     return data
 
 
+## e.g. ?MWMin=100&MWMax=200 or ?BPMax=80&orderBy=BP (g/mol, °C, g/cm³)
+@app.get("/chemicalsearch/", response_model=Page[ChemicalProperties])
+def get_chemical_search(
+    current_user: Annotated[models.User, Depends(validate_current_user)],
+    db: Session = Depends(get_db),
+    filters: ChemicalFilters = Depends(),
+    orderBy: ChemicalSortEnum = Query(ChemicalSortEnum.id),
+    descending: bool = Query(False),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    after: str = Query(None),
+):
+    chemicalsPage = search_chemicals(
+        db,
+        filters=filters,
+        orderBy=orderBy.value,
+        descending=descending,
+        limit=limit,
+        after=after,
+    )
+    data = chemicalsPage
+    return data
+
+
+## details of a chemical that isn't in the database yet (/chemicalquery/ sends 418 for it)
+@app.get("/chemicalresolve/", response_model=ChemicalIn)
+def get_chemical_resolve(
+    current_user: Annotated[models.User, Depends(validate_current_user)],
+    db: Session = Depends(get_db),
+    query: str = Query(...),
+    type: Literal["CAS", "chemicalName"] = Query("CAS"),
+):
+    chemical = lookup_chemical(db, queryType=type, query=query)
+
+    if not chemical:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chemical not found.",
+        )
+
+    data = chemical
+    return data
+
+
 ## rather than sending back all data of each order, just sends the essential
 @app.get("/ordersquery/", response_model=list[QueryOrder])
 async def get_orders_by_query(
-    current_user: Annotated[models.User, Depends(validate_current_user)],
-    db: Session = Depends(get_db),
+    current_user: Annotated[models.User, Depends(validate_current_user_async)],
+    db: AsyncSession = Depends(get_async_db),
     queryType: str = Query(None),
-    queryString: str = Query(None),
+    queryString: str = Query(""),
 ):
-    orders_list = get_orders_list_by_query(
+    orders_list = await get_orders_list_by_query_async(
         db=db, query_string=queryString, query_type=queryType
     )
     data = orders_list
@@ -199,7 +419,7 @@ def add_first_user(
     user: User,
     db: Session = Depends(get_db),
 ):
-    add_new_user(db=db, user=user)
+    run_write(db, lambda session: add_new_user(db=session, user=user))
 
 
 # Admin #
@@ -211,7 +431,7 @@ def add_user(
 ):
     check_duplicate_user(db, username=new_user.username)
 
-    add_new_user(db=db, user=new_user)
+    run_write(db, lambda session: add_new_user(db=session, user=new_user))
 
 
 @app.post("/supplier/")
@@ -222,7 +442,7 @@ def add_supplier(
 ):
     check_duplicate_supplier(db=db, supplierName=supplierData.supplierName)
 
-    add_new_supplier(db=db, supplier=supplierData)
+    run_write(db, lambda session: add_new_supplier(db=session, supplier=supplierData))
 
 
 # User #
@@ -239,19 +459,36 @@ def add_order(
 
     chemicalData = chemOrderData.chemicalData
     orderData = chemOrderData.orderData
+    user_id = current_user.id
 
-    chemical = chemical = (
-        db.query(models.Chemical)
-        .filter(models.Chemical.CAS == chemicalData.CAS)
-        .first()
-    )
+    ## details left out for a chemical new to the database are looked up (outside the write)
+    chemicalData = fill_chemical(db, chemicalData)
 
-    if not chemical:
-        chemical = add_new_chemical(db=db, chemical=chemicalData)
+    ## the chemical (if new) and the order are added in one transaction
+    run_write(
+        db,
+        lambda db: place_order(
+            db=db, user_id=user_id, chemical=chemicalData, order=orderData
+        ),
+    )
 
-    orderData.chemical_id = chemical.id
 
-    add_new_order(db=db, user_id=current_user.id, order=orderData)
+## several orders in one request, one result (with the new order id) per order
+@app.post("/orders/batch/", response_model=list[BatchItemResult])
+def add_orders(
+    batchData: ChemOrderBatchIn,
+    current_user: Annotated[models.User, Depends(validate_current_user)],
+    db: Session = Depends(get_db),
+):
+    user_id = current_user.id
+    results = run_write(
+        db,
+        lambda session: add_new_orders(
+            db=session, user_id=user_id, chemOrders=batchData.orders
+        ),
+    )
+    data = results
+    return data
 
 
 @app.post("/location/", response_model=Location)
@@ -264,8 +501,15 @@ def add_location(
         db=db, locationName=locationData.locationName, user_id=current_user.id
     )
 
-    location = add_new_location(
-        db=db, locationName=locationData.locationName, user_id=current_user.id
+    user_id = current_user.id
+    location = run_write(
+        db,
+        lambda session: Location.model_validate(
+            add_new_location(
+                db=session, locationName=locationData.locationName, user_id=user_id
+            ),
+            from_attributes=True,
+        ),
     )
     data = location
     return data
@@ -279,7 +523,7 @@ def patch_user(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
 ):
-    patch_user_details(db=db, user=user)
+    run_write(db, lambda session: patch_user_details(db=session, user=user))
 
 
 @app.patch("/chemical/")
@@ -288,7 +532,7 @@ def patch_chemical(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
 ):
-    patch_chemical_details(db=db, chemical=chemical)
+    run_write(db, lambda session: patch_chemical_details(db=session, chemical=chemical))
 
 
 @app.patch("/supplier/")
@@ -297,7 +541,7 @@ def patch_supplier(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
 ):
-    patch_supplier_details(db=db, supplier=supplier)
+    run_write(db, lambda session: patch_supplier_details(db=session, supplier=supplier))
 
 
 @app.patch("/order/")
@@ -306,7 +550,7 @@ def patch_order(
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
 ):
-    patch_order_details(db=db, order=order)
+    run_write(db, lambda session: patch_order_details(db=session, order=order))
 
 
 @app.patch("/orderstatus/")
@@ -316,7 +560,25 @@ def patch_status(
     order_id: int = Query(None),
     status: str = Query(None),
 ):
-    patch_order_status(db=db, id=order_id, status=status)
+    run_write(
+        db, lambda session: patch_order_status(db=session, id=order_id, status=status)
+    )
+
+
+@app.patch("/orderstatus/batch/", response_model=list[BatchItemResult])
+def patch_statuses(
+    batchData: OrderStatusBatchIn,
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    db: Session = Depends(get_db),
+):
+    results = run_write(
+        db,
+        lambda session: patch_orders_status(
+            db=session, order_ids=batchData.order_ids, status=batchData.status.value
+        ),
+    )
+    data = results
+    return data
 
 
 # User #
@@ -326,7 +588,7 @@ def modify_inventory_status(
     db: Session = Depends(get_db),
     order_id: str = Query(None),
 ):
-    patch_inventory_status(db=db, order_id=order_id)
+    run_write(db, lambda session: patch_inventory_status(db=session, order_id=order_id))
 
 
 @app.patch("/inventory/", response_model=InventoryPatch)
@@ -335,11 +597,53 @@ def modify_inventory_amount_location(
     current_user: Annotated[models.User, Depends(validate_current_user)],
     db: Session = Depends(get_db),
 ):
-    patched_order = patch_inventory_amount_location(db=db, order=orderData)
+    patched_order = run_write(
+        db,
+        lambda session: InventoryPatch.model_validate(
+            patch_inventory_amount_location(db=session, order=orderData),
+            from_attributes=True,
+        ),
+    )
     data = patched_order
     return data
 
 
+## the batch versions only change the user's own orders (and locations),
+## anything else is reported as forbidden in the results
+@app.patch("/inventorystatus/batch/", response_model=list[BatchItemResult])
+def modify_inventory_statuses(
+    batchData: InventoryStatusBatchIn,
+    current_user: Annotated[models.User, Depends(validate_current_user)],
+    db: Session = Depends(get_db),
+):
+    user_id = current_user.id
+    results = run_write(
+        db,
+        lambda session: patch_inventory_statuses(
+            db=session, user_id=user_id, order_ids=batchData.order_ids
+        ),
+    )
+    data = results
+    return data
+
+
+@app.patch("/inventory/batch/", response_model=list[BatchItemResult])
+def modify_inventory_amounts_locations(
+    batchData: InventoryPatchBatchIn,
+    current_user: Annotated[models.User, Depends(validate_current_user)],
+    db: Session = Depends(get_db),
+):
+    user_id = current_user.id
+    results = run_write(
+        db,
+        lambda session: patch_inventory_amounts_locations(
+            db=session, user_id=user_id, patches=batchData.patches
+        ),
+    )
+    data = results
+    return data
+
+
 ### DELETE ###
 # Admin #
 
@@ -352,7 +656,7 @@ def delete_supplier(
     db: Session = Depends(get_db),
     supplier_id: int = Query(None),
 ):
-    remove_supplier(db=db, id=supplier_id)
+    run_write(db, lambda session: remove_supplier(db=session, id=supplier_id))
 
 
 @app.delete("/chemical/")
@@ -361,7 +665,7 @@ def delete_chemical(
     db: Session = Depends(get_db),
     chemical_id: int = Query(None),
 ):
-    remove_chemical(db=db, id=chemical_id)
+    run_write(db, lambda session: remove_chemical(db=session, id=chemical_id))
 
 
 @app.delete("/order/")
@@ -370,7 +674,7 @@ def delete_order(
     db: Session = Depends(get_db),
     order_id: int = Query(None),
 ):
-    remove_order(db=db, id=order_id)
+    run_write(db, lambda session: remove_order(db=session, id=order_id))
 
 
 # User #
@@ -380,63 +684,113 @@ def delete_location(
     db: Session = Depends(get_db),
     location_id: int = Query(None),
 ):
-    remove_location(db=db, user_id=current_user.id, location_id=location_id)
+    user_id = current_user.id
+    run_write(
+        db,
+        lambda session: remove_location(
+            db=session, user_id=user_id, location_id=location_id
+        ),
+    )
+
+
+### EXPORT ###
+# Admin #
+
+
+## streamed in batches, so memory use doesn't grow with the number of rows;
+## the csv format of orders can be uploaded again to /csv/upload/
+@app.get("/export/orders/")
+def export_orders(
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    filters: OrderFilters = Depends(),
+    format: ExportFormatEnum = Query(ExportFormatEnum.ndjson),
+):
+    data = StreamingResponse(
+        stream_orders(filters=filters, format=format.value),
+        media_type=MEDIA_TYPES[format.value],
+        headers={"Content-Disposition": f"attachment; filename=orders.{format.value}"},
+    )
+    return data
+
+
+@app.get("/export/chemicals/")
+def export_chemicals(
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    format: ExportFormatEnum = Query(ExportFormatEnum.ndjson),
+):
+    data = StreamingResponse(
+        stream_chemicals(format=format.value),
+        media_type=MEDIA_TYPES[format.value],
+        headers={
+            "Content-Disposition": f"attachment; filename=chemicals.{format.value}"
+        },
+    )
+    return data
 
 
 ### IMPORT CSV ###
 
 
-@app.post("/csv/")
-async def import_csv(
+## plain def: the import is CPU-bound, so it runs in the threadpool rather than on the event loop.
+## It is one write, so with the write queue other writes wait for the whole import:
+## large files should go to /csv/upload/ or /csv/jobs/, which write a batch at a time.
+@app.post("/csv/", response_model=CSVImportSummary)
+def import_csv(
     csvData: CSVGlobal,
     current_user: Annotated[models.User, Depends(validate_current_admin)],
     db: Session = Depends(get_db),
 ):
-    userDataList = csvData.userDataList
-    chemicalList = csvData.chemicalList
-    supplierList = csvData.supplierList
-    orderList = csvData.orderList
-    for user in userDataList:
-        db_user = (
-            db.query(models.User).filter(models.User.username == user.username).first()
-        )
-        if not db_user:
-            print(user)
-            add_new_user(db=db, user=user)
+    summary = run_write(
+        db,
+        lambda session: import_csv_data(
+            db=session,
+            userDataList=csvData.userDataList,
+            chemicalList=csvData.chemicalList,
+            supplierList=csvData.supplierList,
+            orderList=csvData.orderList,
+        ),
+    )
+    data = summary
+    return data
 
-    for chemical in chemicalList:
-        db_chemical = (
-            db.query(models.Chemical)
-            .filter(models.Chemical.CAS == chemical.CAS)
-            .first()
-        )
-        if not db_chemical:
-            db_chemical = add_new_chemical(db=db, chemical=chemical)
-        for order in orderList:
-            if order.chemical == db_chemical.CAS:
-                order.chemical = db_chemical.id
-
-    for supplier in supplierList:
-        db_supplier = (
-            db.query(models.Supplier)
-            .filter(models.Supplier.supplierName == supplier.supplierName)
-            .first()
-        )
-        if not db_supplier:
-            db_supplier = add_new_supplier(db=db, supplier=supplier)
-        for order in orderList:
-            if order.supplier == db_supplier.supplierName:
-                order.supplier = db_supplier.id
-
-    for order in orderList:
-        db_order = models.Order(
-            user_id=order.user,
-            chemical_id=order.chemical,
-            supplier_id=order.supplier,
-            amount=order.amount,
-            status=order.status,
-            amountUnit=order.amountUnit,
-            supplierPN=order.supplierPN,
-        )
-        db.add(db_order)
-        db.commit()
+
+## takes the raw file rather than the parsed lists, see CSV_COLUMNS for the layout
+@app.post("/csv/upload/", response_model=CSVUploadReport)
+def upload_csv(
+    file: UploadFile,
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    db: Session = Depends(get_db),
+):
+    report = ingest_csv_file(db=db, file=file.file)
+    data = report
+    return data
+
+
+## runs the same import as /csv/ in the background, poll /csv/jobs/{job_id} for progress
+@app.post("/csv/jobs/", response_model=ImportJob, status_code=status.HTTP_202_ACCEPTED)
+def add_import_job(
+    csvData: CSVGlobal,
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    db: Session = Depends(get_db),
+):
+    user_id = current_user.id
+    job_id = run_write(
+        db,
+        lambda session: add_new_import_job(
+            db=session, user_id=user_id, csvData=csvData
+        ).id,
+    )
+    submit_import_job(job_id)
+
+    data = get_import_job(db=db, job_id=job_id)
+    return data
+
+
+@app.get("/csv/jobs/{job_id}", response_model=ImportJob)
+def get_import_job_status(
+    job_id: int,
+    current_user: Annotated[models.User, Depends(validate_current_admin)],
+    db: Session = Depends(get_db),
+):
+    data = get_import_job(db=db, job_id=job_id)
+    return data
@@ -4,12 +4,17 @@ from sqlalchemy import (
     ForeignKey,
     Integer,
     String,
+    Text,
     Enum,
     DateTime,
+    Float,
+    Index,
     func,
 )
 from sqlalchemy.orm import relationship
 
+from datetime import datetime
+
 from .database import Base
 
 
@@ -28,9 +33,14 @@ class User(Base):
 
 class Location(Base):
     __tablename__ = "locations"
+    __table_args__ = (
+        Index("ix_locations_user_id_locationName", "user_id", "locationName"),
+        Index("ix_locations_user_id_updatedAt", "user_id", "updatedAt"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     locationName = Column(String)
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user_id = Column(Integer, ForeignKey("profiles.id"))
     user = relationship("User", back_populates="location")
@@ -43,24 +53,47 @@ class Chemical(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     CAS = Column(String, unique=True)
-    chemicalName = Column(String, nullable=True)
+    chemicalName = Column(String, nullable=True, index=True)
     MW = Column(String, nullable=True)
     MP = Column(String, nullable=True)
     BP = Column(String, nullable=True)
     density = Column(String, nullable=True)
+    ## MW, MP, BP and density as numbers (g/mol, °C, °C, g/cm³), see functions/properties.py
+    MWValue = Column(Float, nullable=True, index=True)
+    MPValue = Column(Float, nullable=True, index=True)
+    BPValue = Column(Float, nullable=True, index=True)
+    densityValue = Column(Float, nullable=True, index=True)
     smile = Column(String, nullable=True)
-    inchi = Column(String, nullable=True)
+    inchi = Column(String, nullable=True, index=True)
+    structureKey = Column(String(27), nullable=True, index=True)
 
     orders = relationship(
         "Order", back_populates="chemical", cascade="all, delete-orphan"
     )
+    skeletons = relationship(
+        "ChemicalSkeleton", back_populates="chemical", cascade="all, delete-orphan"
+    )
+
+
+## first block of the structure key, for the whole structure and for each component
+class ChemicalSkeleton(Base):
+    __tablename__ = "chemical_skeletons"
+    __table_args__ = (
+        Index("ix_chemical_skeletons_skeleton", "skeleton", "chemical_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    skeleton = Column(String(14))
+
+    chemical_id = Column(Integer, ForeignKey("chemicals.id"))
+    chemical = relationship("Chemical", back_populates="skeletons")
 
 
 class Supplier(Base):
     __tablename__ = "suppliers"
 
     id = Column(Integer, primary_key=True, index=True)
-    supplierName = Column(String)
+    supplierName = Column(String, index=True)
 
     orders = relationship(
         "Order", back_populates="supplier", cascade="all, delete-orphan"
@@ -69,20 +102,25 @@ class Supplier(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_user_id_isConsumed", "user_id", "isConsumed"),
+        Index("ix_orders_status_orderDate", "status", "orderDate"),
+        Index("ix_orders_user_id_updatedAt", "user_id", "updatedAt"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
     user_id = Column(Integer, ForeignKey("profiles.id"))
     user = relationship("User", back_populates="orders")
 
-    chemical_id = Column(Integer, ForeignKey("chemicals.id"))
+    chemical_id = Column(Integer, ForeignKey("chemicals.id"), index=True)
     chemical = relationship("Chemical", back_populates="orders")
 
-    supplier_id = Column(Integer, ForeignKey("suppliers.id"))
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), index=True)
     supplier = relationship("Supplier", back_populates="orders")
 
     location_id = Column(
-        Integer, ForeignKey("locations.id"), nullable=True, default=None
+        Integer, ForeignKey("locations.id"), nullable=True, default=None, index=True
     )
     location = relationship("Location", back_populates="orders")
 
@@ -93,3 +131,83 @@ class Order(Base):
     isConsumed = Column(Boolean, default=False)
     orderDate = Column(DateTime, server_default=func.now())
     supplierPN = Column(String, nullable=True)
+    ## when the order last changed, including its chemical, supplier or user (for /inventorysync/)
+    updatedAt = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+## Stock on hand (received and not consumed) per user, location and chemical, kept up to date
+## by the order writes, see functions/inventorysummary.py. location_id 0 is no location.
+class InventorySummary(Base):
+    __tablename__ = "inventory_summary"
+    __table_args__ = (
+        Index(
+            "ix_inventory_summary_user_id_location_id_chemical_id",
+            "user_id",
+            "location_id",
+            "chemical_id",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer)
+    location_id = Column(Integer)
+    chemical_id = Column(Integer)
+    orders = Column(Integer, default=0)
+    grams = Column(Float, default=0)  # mg and g
+    millilitres = Column(Float, default=0)  # mL and L
+
+
+## answers of the chemical resolver by CAS number or name, found or not,
+## see functions/resolver.py
+class ChemicalLookup(Base):
+    __tablename__ = "chemical_lookup_cache"
+    __table_args__ = (
+        Index(
+            "ix_chemical_lookup_cache_queryType_query",
+            "queryType",
+            "query",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    queryType = Column(Enum("CAS", "chemicalName"))
+    query = Column(String)
+    found = Column(Boolean)
+    data = Column(Text, nullable=True)  # ChemicalIn as JSON
+    fetchedAt = Column(DateTime)
+
+
+## deleted orders and locations, so that /inventorysync/ can tell clients to drop them
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+    __table_args__ = (Index("ix_tombstones_user_id_deletedAt", "user_id", "deletedAt"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(Enum("order", "location"))
+    entity_id = Column(Integer)
+    user_id = Column(Integer)
+    deletedAt = Column(DateTime, default=datetime.utcnow)
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer)  # admin who submitted the job
+    status = Column(
+        Enum("queued", "running", "completed", "failed"), default="queued", index=True
+    )
+    payload = Column(Text)  # CSVGlobal as JSON, kept so the job can be resumed
+    summary = Column(Text, nullable=True)  # CSVImportSummary as JSON
+    error = Column(String, nullable=True)
+
+    rowsTotal = Column(Integer, default=0)
+    rowsDone = Column(Integer, default=0)
+    rowsFailed = Column(Integer, default=0)
+
+    createdAt = Column(DateTime, server_default=func.now())
+    startedAt = Column(DateTime, nullable=True)
+    heartbeatAt = Column(DateTime, nullable=True)
+    finishedAt = Column(DateTime, nullable=True)
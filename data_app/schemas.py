@@ -1,6 +1,6 @@
 from enum import Enum as PyEnum
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Generic, Optional, TypeVar
 from datetime import datetime
 
 
@@ -33,6 +33,34 @@ class Chemical(ChemicalIn):
     id: int
 
 
+## with the numbers read from MW, MP, BP and density (g/mol, °C, °C, g/cm³)
+class ChemicalProperties(Chemical):
+    MWValue: Optional[float] = None
+    MPValue: Optional[float] = None
+    BPValue: Optional[float] = None
+    densityValue: Optional[float] = None
+
+
+class ChemicalSortEnum(str, PyEnum):
+    id = "id"
+    MW = "MW"
+    MP = "MP"
+    BP = "BP"
+    density = "density"
+
+
+## /chemicalsearch/: ranges on the numeric properties, both ends included
+class ChemicalFilters(BaseModel):
+    MWMin: Optional[float] = None
+    MWMax: Optional[float] = None
+    MPMin: Optional[float] = None
+    MPMax: Optional[float] = None
+    BPMin: Optional[float] = None
+    BPMax: Optional[float] = None
+    densityMin: Optional[float] = None
+    densityMax: Optional[float] = None
+
+
 class LocationIn(BaseModel):
     locationName: str
 
@@ -97,6 +125,20 @@ class QueryOrder(BaseModel):
     supplierName: str
 
 
+class ExportFormatEnum(str, PyEnum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class OrderFilters(BaseModel):
+    status: Optional[StatusEnum] = None
+    dateFrom: Optional[datetime] = None
+    dateTo: Optional[datetime] = None
+    user_id: Optional[int] = None
+    supplier_id: Optional[int] = None
+    isConsumed: Optional[bool] = None
+
+
 class ChemOrderIn(BaseModel):
     chemicalData: ChemicalIn
     orderData: OrderIn
@@ -107,6 +149,18 @@ class Inventory(BaseModel):
     ordersList: list[Order]
 
 
+## /inventorysync/: the orders and locations changed since syncToken was handed out.
+## Clients drop the deleted ids first, then upsert the changed rows.
+## If full is true this is everything, and local data not in it should be dropped.
+class InventorySync(BaseModel):
+    locationsList: list[Location]
+    ordersList: list[Order]
+    deletedLocations: list[int]
+    deletedOrders: list[int]
+    syncToken: str
+    full: bool
+
+
 class InventoryPatchIn(BaseModel):
     id: int  ## order id
     amount: int
@@ -126,3 +180,98 @@ class CSV(BaseModel):
     chemicalList: list[Chemical]
     supplierList: list[Supplier]
     orderList: list[Order]
+
+
+## /analytics/: amounts are in grams (mg, g) and millilitres (mL, L)
+class ChemicalStock(BaseModel):
+    chemical_id: int
+    CAS: str
+    chemicalName: Optional[str] = None
+    orders: int
+    grams: float
+    millilitres: float
+
+
+## a user's stock of a chemical at one location, from the inventory summary
+class InventoryStock(BaseModel):
+    location_id: Optional[int] = None  ## None: no location
+    locationName: Optional[str] = None
+    chemical_id: int
+    CAS: str
+    chemicalName: Optional[str] = None
+    orders: int
+    grams: float
+    millilitres: float
+
+
+class SupplierMonth(BaseModel):
+    supplier_id: int
+    supplierName: str
+    month: str  ## YYYY-MM
+    orders: int
+    grams: float
+    millilitres: float
+
+
+class StatusCount(BaseModel):
+    status: StatusEnum
+    orders: int
+
+
+class Analytics(BaseModel):
+    stockByChemical: list[ChemicalStock]  ## received and not consumed
+    supplierMonths: list[SupplierMonth]
+    statusCounts: list[StatusCount]
+
+
+## Batch endpoints: each item is handled on its own and gets a result, in the order sent.
+## Batches are capped so the ids fit in a single IN (...) for SQLite.
+MAX_BATCH_SIZE = 500
+
+
+class OrderStatusBatchIn(BaseModel):
+    order_ids: list[int] = Field(max_length=MAX_BATCH_SIZE)
+    status: StatusEnum
+
+
+class InventoryStatusBatchIn(BaseModel):
+    order_ids: list[int] = Field(max_length=MAX_BATCH_SIZE)
+
+
+class InventoryPatchBatchIn(BaseModel):
+    patches: list[InventoryPatchIn] = Field(max_length=MAX_BATCH_SIZE)
+
+
+class ChemOrderBatchIn(BaseModel):
+    orders: list[ChemOrderIn] = Field(max_length=MAX_BATCH_SIZE)
+
+
+class BatchItemStatusEnum(str, PyEnum):
+    created = "created"
+    updated = "updated"
+    not_found = "not_found"
+    forbidden = "forbidden"
+
+
+class BatchItemResult(BaseModel):
+    id: Optional[int] = None  ## order id
+    status: BatchItemStatusEnum
+    detail: Optional[str] = None
+
+
+class PoolStats(BaseModel):
+    sessions: int  # one per request that uses the database
+    connects: int
+    checkouts: int
+    checkins: int
+    checkedOut: Optional[int] = None
+    poolSize: Optional[int] = None
+    overflow: Optional[int] = None
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    nextCursor: Optional[str] = None  # pass as "after" to get the next page
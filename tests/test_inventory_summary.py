@@ -0,0 +1,161 @@
+## Runs two writes to the same order at the same time, on two sessions of a SQLite file
+## set up as the app sets up its own (pysqlite beginning transactions itself, no write
+## queue), and checks that inventory_summary ends up as rebuild_inventory_summary() has it.
+## The first write is held at its commit while the second one starts, so without the order
+## being locked the second one would work out its change from the values the first replaces.
+##
+## run from the repository root:
+##   python -m pytest
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from data_app import models
+from data_app.database import Base, set_sqlite_pragmas
+from data_app.schemas import InventoryPatchIn
+from data_app.functions.batch import patch_inventory_amounts_locations
+from data_app.functions.inventory2 import patch_inventory_amount_location
+from data_app.functions.inventorysummary import (
+    StockChanges,
+    count_stock,
+    rebuild_inventory_summary,
+    stock_fields,
+)
+from data_app.functions.order import remove_order
+from data_app.functions.supplier import remove_supplier
+
+
+def patch_amount(amount: int):
+    return lambda db: patch_inventory_amount_location(
+        db, InventoryPatchIn(id=1, amount=amount, isConsumed=False, location_id=1)
+    )
+
+
+def patch_amounts(amount: int):
+    return lambda db: patch_inventory_amounts_locations(
+        db,
+        user_id=1,
+        patches=[
+            InventoryPatchIn(id=1, amount=amount, isConsumed=False, location_id=1)
+        ],
+    )
+
+
+CASES = {
+    "amount and amount": (patch_amount(5), patch_amount(7)),
+    "batch amounts": (patch_amounts(5), patch_amounts(7)),
+    "delete and amount": (lambda db: remove_order(db, 1), patch_amount(7)),
+    "supplier delete and amount": (lambda db: remove_supplier(db, 1), patch_amount(7)),
+}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/summary.db", connect_args={"check_same_thread": False}
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.execute(insert(models.User), [{"id": 1, "username": "u", "full_name": "U"}])
+        db.execute(
+            insert(models.Chemical), [{"CAS": "64-17-5", "chemicalName": "Ethanol"}]
+        )
+        db.execute(insert(models.Supplier), [{"supplierName": "Acme"}])
+        db.execute(insert(models.Location), [{"locationName": "Shelf", "user_id": 1}])
+        db.execute(
+            insert(models.Order),
+            [
+                {
+                    "user_id": 1,
+                    "chemical_id": 1,
+                    "supplier_id": 1,
+                    "location_id": 1,
+                    "status": "received",
+                    "isConsumed": False,
+                    "amount": 10,
+                    "amountUnit": "g",
+                }
+            ],
+        )
+        db.commit()
+        rebuild_inventory_summary(db)
+    yield engine
+    engine.dispose()
+
+
+def run(engine, write, before_commit=None):
+    with Session(engine) as db:
+        if before_commit:
+            commit = db.commit
+
+            def held_commit():
+                before_commit()
+                commit()
+
+            db.commit = held_commit
+        try:
+            write(db)
+        except HTTPException:
+            ## e.g. the order was deleted by the other write
+            db.rollback()
+
+
+def summary_rows(engine):
+    with Session(engine) as db:
+        return db.execute(
+            select(
+                models.InventorySummary.user_id,
+                models.InventorySummary.location_id,
+                models.InventorySummary.chemical_id,
+                models.InventorySummary.orders,
+                models.InventorySummary.grams,
+            ).order_by(models.InventorySummary.id)
+        ).all()
+
+
+@pytest.mark.parametrize("first, second", CASES.values(), ids=CASES.keys())
+def test_overlapping_writes_keep_the_summary(engine, first, second):
+    at_commit = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        at_commit.set()
+        release.wait(5)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first_done = executor.submit(run, engine, first, hold)
+        assert at_commit.wait(5)
+        second_done = executor.submit(run, engine, second)
+        ## the second write waits for the first one's lock
+        ## (or, with nothing locked, reads the values the first one replaces)
+        with pytest.raises(TimeoutError):
+            second_done.result(timeout=0.5)
+        release.set()
+        first_done.result()
+        second_done.result()
+
+    summary = summary_rows(engine)
+    with Session(engine) as db:
+        rebuild_inventory_summary(db)
+    assert summary == summary_rows(engine)
+
+
+## rows from before isConsumed had a default can hold NULL, which IN_STOCK (and so the
+## rebuild) doesn't count as in stock
+def test_null_is_consumed_is_not_in_stock(engine):
+    with Session(engine) as db:
+        db.execute(update(models.Order).values(isConsumed=None))
+        db.commit()
+        rebuild_inventory_summary(db)
+        assert summary_rows(engine) == []
+
+        order = db.get(models.Order, 1)
+        changes = StockChanges()
+        count_stock(changes, stock_fields(order))
+        assert not changes
@@ -0,0 +1,58 @@
+## The numbers read from the free-text physical properties, see functions/properties.py.
+##
+## run from the repository root:
+##   python -m pytest
+
+import pytest
+
+from data_app.functions.properties import (
+    parse_boiling_point,
+    parse_density,
+    parse_molecular_weight,
+    parse_temperature,
+)
+
+BOILING_POINTS = {
+    "89.3 °C": 89.3,
+    "78-80 °C": 79.0,
+    "212 °F": 100.0,
+    "186 °C (decomp)": 186.0,
+    ## at atmospheric pressure, however it is written
+    "78 °C @ Press: 760 Torr": 78.0,
+    "78 °C (760 mmHg)": 78.0,
+    "78 °C @ 1 atm": 78.0,
+    "80 °C @ 101.3 kPa": 80.0,
+    ## at a reduced pressure, so no value
+    "97-98 °C @ Press: 3 Torr": None,
+    "100 °C @ Press: 3": None,
+    "97 °C @ 3 mmHg": None,
+    "110-112 °C (15 mmHg)": None,
+    "110 °C/15 mm": None,
+    "110 °C / 15 mm Hg": None,
+    "65 °C (0.1 mbar)": None,
+    "80 °C @ 10 kPa": None,
+    "": None,
+    None: None,
+}
+
+
+@pytest.mark.parametrize("text, value", BOILING_POINTS.items())
+def test_boiling_point(text, value):
+    assert parse_boiling_point(text) == pytest.approx(value)
+
+
+@pytest.mark.parametrize(
+    "parse, text, value",
+    [
+        (parse_molecular_weight, "101.19 g/mol", 101.19),
+        (parse_molecular_weight, "46.07", 46.07),
+        (parse_temperature, "-114.7 °C", -114.7),
+        (parse_temperature, "113-115 °C", 114.0),
+        (parse_temperature, "373.15 K", 100.0),
+        (parse_density, "0.7255 g/cm³ @ Temp: 25 °C", 0.7255),
+        (parse_density, "789 kg/m³", 0.789),
+        (parse_density, "1.2 lb/gal", None),
+    ],
+)
+def test_other_properties(parse, text, value):
+    assert parse(text) == pytest.approx(value)
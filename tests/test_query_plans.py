@@ -0,0 +1,220 @@
+## Runs the queries behind the hot endpoints against a database built from the models and
+## checks with EXPLAIN QUERY PLAN that every table they read is searched through an index
+## (or its primary key), so a change to the models or queries that drops an index fails here.
+## The async def endpoints' queries are run on an AsyncSession, as the endpoints run them.
+##
+## run from the repository root:
+##   python -m pytest
+
+import asyncio
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from data_app import models
+from data_app.database import Base
+from data_app.csvschema import CSVChemical, CSVSupplier, CSVUserData, CSVOrder
+from data_app.schemas import OrderFilters
+from data_app.functions.csvimport import import_csv_data
+from data_app.functions.location import (
+    check_duplicate_location,
+    get_locations_list_async,
+)
+from data_app.functions.order import (
+    get_orders_list_async,
+    get_orders_list_by_query_async,
+    get_orders_page,
+)
+from data_app.functions.pagination import encode_cursor
+from data_app.functions.search import setup_search_index
+from data_app.functions.supplier import check_duplicate_supplier
+
+ETHANOL = "InChI=1S/C2H6O/c1-2-3/h3H,2H2,1H3"
+
+## run on an AsyncSession
+ASYNC_CASES = {
+    "/inventory/ locations": lambda db: get_locations_list_async(db, user_id=1),
+    "/inventory/ orders": lambda db: get_orders_list_async(db, user_id=1),
+    "/inventorysync/ orders": lambda db: get_orders_list_async(
+        db, user_id=1, since=datetime(2023, 1, 1)
+    ),
+    "/ordersquery/ string": lambda db: get_orders_list_by_query_async(
+        db, query_string="eth", query_type="string"
+    ),
+    "/ordersquery/ structure": lambda db: get_orders_list_by_query_async(
+        db, query_string=ETHANOL, query_type="structure"
+    ),
+    "/ordersquery/ connectivity": lambda db: get_orders_list_by_query_async(
+        db, query_string=ETHANOL, query_type="connectivity"
+    ),
+}
+
+## run on a Session
+CASES = {
+    "/orderslist/ next page": lambda db: get_orders_page(
+        db, OrderFilters(), limit=100, after=encode_cursor(100)
+    ),
+    "/orderslist/ status and dates": lambda db: get_orders_page(
+        db,
+        OrderFilters(status="received", dateFrom=datetime(2023, 1, 1)),
+        limit=100,
+    ),
+    "/orderslist/ user": lambda db: get_orders_page(
+        db, OrderFilters(user_id=1, isConsumed=False), limit=100
+    ),
+    "/orderslist/ supplier": lambda db: get_orders_page(
+        db, OrderFilters(supplier_id=1), limit=100
+    ),
+    "/chemicalquery/ CAS": lambda db: db.query(models.Chemical)
+    .filter(models.Chemical.CAS == "64-17-5")
+    .first(),
+    "/chemicalquery/ chemicalName": lambda db: db.query(models.Chemical)
+    .filter(models.Chemical.chemicalName == "Ethanol")
+    .first(),
+    "/location/ duplicate check": lambda db: check_duplicate_location(
+        db, locationName="Shelf 2", user_id=1
+    ),
+    "/supplier/ duplicate check": lambda db: check_duplicate_supplier(
+        db, supplierName="Other"
+    ),
+    "/csv/ key lookups": lambda db: import_csv_data(
+        db,
+        userDataList=[CSVUserData(id=2, username="new", full_name="New")],
+        chemicalList=[CSVChemical(CAS="67-64-1", chemicalName="Acetone")],
+        supplierList=[CSVSupplier(supplierName="Other")],
+        orderList=[
+            CSVOrder(
+                user=2,
+                chemical="67-64-1",
+                supplier="Other",
+                status="ordered",
+                amount=1,
+                amountUnit="L",
+            )
+        ],
+        commit=False,
+    ),
+}
+
+## "SCAN orders" is a full scan, "SCAN chemicals_fts VIRTUAL TABLE" or "SCAN (subquery-1)" are not
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX \w+)?$")
+## "SEARCH orders USING INDEX ix_orders_user_id (user_id=?)"
+SEARCH = re.compile(r"^SEARCH (\w+) USING (?:(?:COVERING )?INDEX|INTEGER PRIMARY KEY)")
+
+
+def seed(db: Session):
+    db.execute(insert(models.User), [{"id": 1, "username": "u", "full_name": "U"}])
+    db.execute(
+        insert(models.Chemical),
+        [{"CAS": "64-17-5", "chemicalName": "Ethanol", "inchi": ETHANOL}],
+    )
+    db.execute(insert(models.Supplier), [{"supplierName": "Acme"}])
+    db.execute(insert(models.Location), [{"locationName": "Shelf", "user_id": 1}])
+    db.execute(
+        insert(models.Order),
+        [
+            {
+                "user_id": 1,
+                "chemical_id": 1,
+                "supplier_id": 1,
+                "location_id": 1,
+                "amount": 1,
+                "amountUnit": "L",
+            }
+        ],
+    )
+    db.commit()
+
+
+## a file rather than in memory, so that the async engine sees the same database
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    setup_search_index(engine)
+    with Session(engine) as db:
+        seed(db)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def async_engine(engine):
+    ## NullPool: every case runs in an event loop of its own
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{engine.url.database}", poolclass=NullPool
+    )
+    yield async_engine
+    asyncio.run(async_engine.dispose())
+
+
+async def run_async(async_engine, case):
+    async with AsyncSession(async_engine) as db:
+        await case(db)
+        await db.rollback()
+
+
+def run_sync(engine, case):
+    with Session(engine) as db:
+        case(db)
+        db.rollback()
+
+
+def query_plans(engine, run, listen_on):
+    ## the plan of each SELECT run() runs on listen_on, as lists of detail lines
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(listen_on, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(listen_on, "before_cursor_execute", capture)
+
+    plans = []
+    raw = engine.raw_connection()
+    try:
+        for statement, parameters in statements:
+            cursor = raw.cursor()
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append([row[3] for row in cursor.fetchall()])
+            cursor.close()
+    finally:
+        raw.close()
+    return plans
+
+
+def check_plans(plans):
+    assert plans, "the case ran no SELECT"
+
+    for plan in plans:
+        text = "\n".join(plan)
+        for detail in plan:
+            match = FULL_SCAN.match(detail)
+            assert not (match and match.group(1) in Base.metadata.tables), text
+        assert any(SEARCH.match(detail) for detail in plan), text
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_tables_are_read_through_an_index(engine, case):
+    check_plans(query_plans(engine, lambda: run_sync(engine, case), engine))
+
+
+@pytest.mark.parametrize("case", ASYNC_CASES.values(), ids=ASYNC_CASES.keys())
+def test_async_tables_are_read_through_an_index(engine, async_engine, case):
+    check_plans(
+        query_plans(
+            engine,
+            lambda: asyncio.run(run_async(async_engine, case)),
+            async_engine.sync_engine,
+        )
+    )